@@ -2,6 +2,9 @@
 
 cd scripts
 
+#bring the DB schema up to date (does nothing if no upgrade is needed)
+python3 gog_db_schema.py -u
+
 python3 gog_forums_scan.py
 
 python3 gog_products_scan.py -n
@@ -28,5 +31,9 @@ python3 gog_ratings_scan.py -u
 #only relevant if you set the correct CUTOFF_DATE
 #python3 gog_plot_gen.py -i
 
+#uncomment if you want to run a full DB maintenance (vacuum & analyze)
+#after each update scan - weekly runs are usually sufficient
+#python3 gog_db_schema.py -m
+
 cd ..
 
@@ -22,9 +22,14 @@ from sys import argv
 from shutil import copy2
 from configparser import ConfigParser
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from time import sleep
-from collections import OrderedDict
 from logging.handlers import RotatingFileHandler
+try:
+    # optional, but a lot faster at parsing large API payloads
+    import orjson
+except ImportError:
+    orjson = None
 # uncomment for debugging purposes only
 #import traceback
 
@@ -67,17 +72,44 @@ UPDATE_INSTALLERS_DELTA_QUERY = ('UPDATE gog_installers_delta SET gid_int_update
                                  'WHERE gid_int_id = ? AND gid_int_os = ? AND gid_int_fixed IS NULL')
 
 OPTIMIZE_QUERY = 'PRAGMA optimize'
+# fully checkpoint and reset the WAL file once a scan is complete
+WAL_CHECKPOINT_QUERY = 'PRAGMA wal_checkpoint(TRUNCATE)'
+# WAL journaling lets the scan processes keep reading while another one is writing, and with
+# synchronous=NORMAL commits no longer wait on an fsync (the DB can't get corrupted, though
+# the last few commits may be lost on power failure, which a rescan will fix anyway)
+CONNECTION_PRAGMA_QUERIES = ('PRAGMA journal_mode=WAL',
+                             'PRAGMA synchronous=NORMAL',
+                             'PRAGMA temp_store=MEMORY',
+                             'PRAGMA cache_size=-20000',
+                             # memory map (up to) the first 256 MB of the DB file, to save on read syscalls
+                             'PRAGMA mmap_size=268435456')
 
 # value separator for multi-valued fields
 MVF_VALUE_SEPARATOR = '; '
+# combined size (in characters) of the old and new json payloads above which no diff will be stored
+DIFF_SIZE_LIMIT = 1048576
 # supported build OSes, with valid API endpoints
 SUPPORTED_OSES = ('windows', 'osx')
+# strip any punctuation or other grouping characters from builds/versions
+STRIP_OUT_CHARS = [' ', ',', '.', '-', '_', '[', ']', '(', ')', '{', '}', '/', '\\']
+# build a dictionary for translation-based removal
+STRIP_OUT_DICT = {ord(strip_out_char): None for strip_out_char in STRIP_OUT_CHARS}
+# static regex pattern for removing end-of-string RC identifier from builds/installers
+GOG_RC_REMOVAL_REGEX = re.compile(r'RC[0-9]{1}$')
+# static regex pattern for removing end-of-string GOG version strings from builds/installers
+GOG_VERSION_REMOVAL_REGEX = re.compile(r'GOG[0-9]{0,5}$')
 # number of seconds a process will wait to get/put in a queue
 QUEUE_WAIT_TIMEOUT = 10 #seconds
 # allow a process to fully load before starting the next process
 # (helps preserve process start order for logging purposes)
 PROCESS_START_WAIT_INTERVAL = 0.05 #seconds
+# number of seconds a connection will wait for the DB lock to be released by other processes
+DB_BUSY_TIMEOUT = 5 #seconds
 HTTP_OK = 200
+# number of hosts for which keep-alive connections are pooled by a session
+HTTP_POOL_CONNECTIONS = 4
+# number of keep-alive connections which are kept open for any given host
+HTTP_POOL_MAXSIZE = 10
 
 def sigterm_handler(signum, frame):
     # exceptions may happen here as well due to logger syncronization mayhem on shutdown
@@ -97,6 +129,42 @@ def sigint_handler(signum, frame):
 
     raise SystemExit(0)
 
+def gog_session():
+    session = requests.Session()
+    # retries are handled by the scan logic, so only tune connection pooling here
+    http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', http_adapter)
+
+    return session
+
+def gog_db_connect():
+    db_connection = sqlite3.connect(DB_FILE_PATH, timeout=DB_BUSY_TIMEOUT)
+
+    for pragma_query in CONNECTION_PRAGMA_QUERIES:
+        db_connection.execute(pragma_query)
+
+    return db_connection
+
+def gog_db_checkpoint(db_connection, optimize=True):
+    if optimize:
+        logger.debug('Running PRAGMA optimize...')
+        db_connection.execute(OPTIMIZE_QUERY)
+    # any pending changes need to be committed in order to be checkpointed
+    db_connection.commit()
+    logger.debug('Running WAL checkpoint...')
+    db_connection.execute(WAL_CHECKPOINT_QUERY)
+
+def json_loads(json_content):
+    if orjson is not None:
+        try:
+            return orjson.loads(json_content)
+        # orjson is stricter than the json module (e.g. when it comes to
+        # lone surrogates), so give any rejected payloads a second chance
+        except orjson.JSONDecodeError:
+            pass
+
+    return json.loads(json_content)
+
 def gog_builds_query(process_tag, product_id, os_value, scan_mode,
                      db_lock, session, db_connection):
 
@@ -105,20 +173,20 @@ def gog_builds_query(process_tag, product_id, os_value, scan_mode,
     try:
         response = session.get(builds_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'{process_tag}BQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('%sBQ >>> HTTP response code: %s.', process_tag, response.status_code)
 
         if response.status_code == HTTP_OK:
             try:
-                json_parsed = json.loads(response.text, object_pairs_hook=OrderedDict)
+                json_parsed = json_loads(response.content)
 
                 total_count = json_parsed['total_count']
-                logger.debug(f'{process_tag}BQ >>> Total count: {total_count}.')
+                logger.debug('%sBQ >>> Total count: %s.', process_tag, total_count)
             except:
                 logger.warning(f'{process_tag}BQ >>> Unable to retrieve total_count for {product_id}, {os_value}.')
                 raise Exception()
 
             if total_count > 0:
-                logger.debug(f'{process_tag}BQ >>> Found builds for id {product_id}, {os_value}...')
+                logger.debug('%sBQ >>> Found builds for id %s, %s...', process_tag, product_id, os_value)
 
                 db_cursor = db_connection.execute('SELECT COUNT(*) FROM gog_builds WHERE gb_int_id = ? AND gb_int_os = ?',
                                                   (product_id, os_value))
@@ -187,7 +255,7 @@ def gog_builds_query(process_tag, product_id, os_value, scan_mode,
                         existing_removed, existing_json_formatted, existing_product_name = db_cursor.fetchone()
 
                         if existing_removed is not None:
-                            logger.debug(f'{process_tag}BQ >>> Found a previously removed entry for {product_id}, {os_value}. Clearing removed status...')
+                            logger.debug('%sBQ >>> Found a previously removed entry for %s, %s. Clearing removed status...', process_tag, product_id, os_value)
                             with db_lock:
                                 db_cursor.execute('UPDATE gog_builds SET gb_int_removed = NULL WHERE gb_int_id = ? AND gb_int_os = ?',
                                                   (product_id, os_value))
@@ -203,12 +271,17 @@ def gog_builds_query(process_tag, product_id, os_value, scan_mode,
                             logger.info(f'{process_tag}BQ ~~~ Successfully updated product name for DB entry with id {product_id}, {os_value}.')
 
                         if existing_json_formatted != json_formatted:
-                            logger.debug(f'{process_tag}BQ >>> Existing entry for {product_id}, {os_value} is outdated. Updating...')
+                            logger.debug('%sBQ >>> Existing entry for %s, %s is outdated. Updating...', process_tag, product_id, os_value)
 
                             # calculate the diff between the new json and the previous one
                             # (applying the diff on the new json will revert to the previous version)
-                            diff_formatted = ''.join([line for line in difflib.unified_diff(json_formatted.splitlines(1),
-                                                                                           existing_json_formatted.splitlines(1), n=0)])
+                            # difflib can take ages to process very large payloads, so skip the diff in that case
+                            if len(existing_json_formatted) + len(json_formatted) > DIFF_SIZE_LIMIT:
+                                logger.warning(f'{process_tag}BQ >>> The data for {product_id}, {os_value} is too large to diff. Skipping diff.')
+                                diff_formatted = None
+                            else:
+                                diff_formatted = ''.join(difflib.unified_diff(json_formatted.splitlines(keepends=True),
+                                                                              existing_json_formatted.splitlines(keepends=True), n=0))
 
                             # gb_int_updated, gb_int_json_payload, gb_int_json_diff,
                             # gb_total_count, gb_count, gb_main_version_names, gb_branch_version_names,
@@ -234,7 +307,7 @@ def gog_builds_query(process_tag, product_id, os_value, scan_mode,
 
                     # only alter the entry if not already marked as removed
                     if existing_delisted is None:
-                        logger.debug(f'{process_tag}BQ >>> All builds for {product_id}, {os_value} have been removed...')
+                        logger.debug('%sBQ >>> All builds for %s, %s have been removed...', process_tag, product_id, os_value)
                         with db_lock:
                             # also reset/clear all other attributes (and diff field) in order to reflect the removal;
                             # previous values will still be stored as part of the attached json payload
@@ -244,7 +317,7 @@ def gog_builds_query(process_tag, product_id, os_value, scan_mode,
                             db_connection.commit()
                         logger.warning(f'{process_tag}BQ --- Marked the builds for {product_id}, {os_value}: {product_name} as removed.')
                     else:
-                        logger.debug(f'{process_tag}BQ >>> Builds for {product_id}, {os_value} are already marked as removed.')
+                        logger.debug('%sBQ >>> Builds for %s, %s are already marked as removed.', process_tag, product_id, os_value)
 
         else:
             logger.warning(f'{process_tag}BQ >>> HTTP error code {response.status_code} received for {product_id}, {os_value}.')
@@ -263,7 +336,7 @@ def gog_builds_query(process_tag, product_id, os_value, scan_mode,
         return False
 
     except:
-        logger.debug(f'{process_tag}BQ >>> Builds query has failed for {product_id}, {os_value}.')
+        logger.debug('%sBQ >>> Builds query has failed for %s, %s.', process_tag, product_id, os_value)
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
         return False
@@ -280,7 +353,7 @@ def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
 
     processConfigParser = ConfigParser()
 
-    with requests.Session() as processSession, sqlite3.connect(DB_FILE_PATH) as process_db_connection:
+    with gog_session() as processSession, gog_db_connect() as process_db_connection:
         logger.info(f'{process_tag}>>> Starting worker process...')
 
         try:
@@ -292,7 +365,7 @@ def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
 
                 while not retries_complete and not terminate_event.is_set():
                     if retry_counter > 0:
-                        logger.debug(f'{process_tag}>>> Retry count: {retry_counter}.')
+                        logger.debug('%s>>> Retry count: %s.', process_tag, retry_counter)
                         # main iteration incremental sleep
                         sleep((INCREMENTAL_RETRY_BASE ** (retry_counter - 1)) * RETRY_SLEEP_INTERVAL)
 
@@ -322,14 +395,14 @@ def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
 
         # the main process has stopped populating the queue if this exception is raised
         except queue.Empty:
-            logger.debug(f'{process_tag}>>> Timed out while waiting for queue.')
+            logger.debug('%s>>> Timed out while waiting for queue.', process_tag)
 
         except SystemExit:
             pass
 
         logger.info(f'{process_tag}>>> Stopping worker process...')
 
-        logger.debug(f'{process_tag}>>> Running PRAGMA optimize...')
+        logger.debug('%s>>> Running PRAGMA optimize...', process_tag)
         with db_lock:
             process_db_connection.execute(OPTIMIZE_QUERY)
 
@@ -376,8 +449,8 @@ if __name__ == "__main__":
 
         scan_mode = general_section.get('scan_mode')
         # ids that will be skipped, for one reason or another
-        SKIP_IDS = [int(product_id.strip()) for product_id in
-                    general_section.get('skip_ids').split(',') if product_id != '']
+        SKIP_IDS = frozenset(int(product_id.strip()) for product_id in
+                             general_section.get('skip_ids').split(',') if product_id != '')
         CONF_BACKUP = general_section.get('conf_backup')
         DB_BACKUP = general_section.get('db_backup')
         HTTP_TIMEOUT = general_section.getint('http_timeout')
@@ -476,7 +549,7 @@ if __name__ == "__main__":
                 try:
                     if product_id not in SKIP_IDS:
                         id_queue.put(product_id, True, QUEUE_WAIT_TIMEOUT)
-                        logger.debug(f'Processing the following id: {product_id}.')
+                        logger.debug('Processing the following id: %s.', product_id)
                     else:
                         logger.warning(f'Skipping the following id: {product_id}.')
                         
@@ -504,6 +577,10 @@ if __name__ == "__main__":
 
             logger.info('The worker processes have been stopped.')
 
+            # the worker processes can't fully checkpoint the WAL while any of the others are still writing
+            with gog_db_connect() as db_connection:
+                gog_db_checkpoint(db_connection, optimize=False)
+
     elif scan_mode == 'update':
         logger.info('--- Running in UPDATE scan mode ---')
 
@@ -520,7 +597,7 @@ if __name__ == "__main__":
             logger.info(f'Restarting update scan from id: {last_id}.')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT DISTINCT gb_int_id FROM gog_builds WHERE gb_int_removed IS NULL AND '
                                                   'gb_int_id > ? ORDER BY 1', (last_id,))
                 id_list = db_cursor.fetchall()
@@ -532,7 +609,7 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
+                        logger.debug('Now processing id %s...', current_product_id)
     
                         for os_value in SUPPORTED_OSES:
                             retries_complete = False
@@ -572,8 +649,7 @@ if __name__ == "__main__":
 
                         logger.info(f'Saved scan up to last_id of {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -583,7 +659,7 @@ if __name__ == "__main__":
         logger.info('--- Running in PRODUCTS scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 # select all existing ids from the gog_products table which are not already present in the
                 # gog_builds table and atempt to scan them from matching builds API entries
                 db_cursor = db_connection.execute('SELECT gp_id FROM gog_products WHERE gp_id NOT IN '
@@ -596,7 +672,7 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
+                        logger.debug('Now processing id %s...', current_product_id)
     
                         for os_value in SUPPORTED_OSES:
                             retries_complete = False
@@ -624,8 +700,7 @@ if __name__ == "__main__":
                     else:
                         logger.warning(f'Skipping the following id: {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -634,19 +709,10 @@ if __name__ == "__main__":
     elif scan_mode == 'delta':
         logger.info('--- Running in DELTA scan mode ---')
 
-        # strip any punctuation or other grouping characters from builds/versions
-        STRIP_OUT_CHARS = [' ', ',', '.', '-', '_', '[', ']', '(', ')', '{', '}', '/', '\\']
-        # build a dictionary for translation-based removal
-        STRIP_OUT_DICT = {ord(strip_out_char): None for strip_out_char in STRIP_OUT_CHARS}
-        # static regex pattern for removing end-of-string RC identifier from builds/installers
-        GOG_RC_REMOVAL_REGEX = re.compile(r'RC[0-9]{1}$')
-        # static regex pattern for removing end-of-string GOG version strings from builds/installers
-        GOG_VERSION_REMOVAL_REGEX = re.compile(r'GOG[0-9]{0,5}$')
-
         detected_discrepancies = {'windows': [], 'osx': []}
 
         try:
-            with sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_db_connect() as db_connection:
                 # select all existing ids from the gog_builds table (with valid builds) that are also present in the gog_files table
                 db_cursor = db_connection.execute('SELECT gb_int_id, gb_int_os, gb_int_title, gb_main_version_names FROM gog_builds '
                                                   'WHERE gb_main_version_names IS NOT NULL AND gb_int_id IN '
@@ -660,12 +726,12 @@ if __name__ == "__main__":
                     current_os_value = delta_entry[1]
                     # 'osx' compatible products have installer OS field values of 'mac', not 'osx'...
                     current_os_files = 'mac' if current_os_value == 'osx' else current_os_value
-                    logger.debug(f'Now processing id {current_product_id}, {current_os_value}...')
+                    logger.debug('Now processing id %s, %s...', current_product_id, current_os_value)
 
                     current_product_title = delta_entry[2]
 
                     current_main_version_names = delta_entry[3].split(MVF_VALUE_SEPARATOR)
-                    logger.debug(f'Current builds main version names are: {current_main_version_names}.')
+                    logger.debug('Current builds main version names are: %s.', current_main_version_names)
 
                     # restricing languages to 'en' only will solve a lot of version discrepancy problems,
                     # as some installers get misversioned non-english languages added at later points in time,
@@ -685,9 +751,9 @@ if __name__ == "__main__":
 
                     if latest_version is not None:
                         current_latest_build_version_orig = current_main_version_names[0].strip()
-                        logger.debug(f'Current latest main build version is: {current_latest_build_version_orig}.')
+                        logger.debug('Current latest main build version is: %s.', current_latest_build_version_orig)
                         current_latest_file_version_orig = latest_version[0].strip()
-                        logger.debug(f'Current latest file version is: {current_latest_file_version_orig}.')
+                        logger.debug('Current latest file version is: %s.', current_latest_file_version_orig)
 
                         excluded = False
 
@@ -719,15 +785,15 @@ if __name__ == "__main__":
 
                         # remove RCX strings
                         current_latest_build_version = GOG_RC_REMOVAL_REGEX.sub('', current_latest_build_version)
-                        logger.debug(f'Post RCX comparison build version is: {current_latest_build_version}.')
+                        logger.debug('Post RCX comparison build version is: %s.', current_latest_build_version)
                         current_latest_file_version = GOG_RC_REMOVAL_REGEX.sub('', current_latest_file_version)
-                        logger.debug(f'Post RCX comparison file version is: {current_latest_file_version}.')
+                        logger.debug('Post RCX comparison file version is: %s.', current_latest_file_version)
 
                         # remove (GOG-X) strings
                         current_latest_build_version = GOG_VERSION_REMOVAL_REGEX.sub('', current_latest_build_version)
-                        logger.debug(f'Post GOG-X comparison build version is: {current_latest_build_version}.')
+                        logger.debug('Post GOG-X comparison build version is: %s.', current_latest_build_version)
                         current_latest_file_version = GOG_VERSION_REMOVAL_REGEX.sub('', current_latest_file_version)
-                        logger.debug(f'Post GOG-X comparison file version is: {current_latest_file_version}.')
+                        logger.debug('Post GOG-X comparison file version is: %s.', current_latest_file_version)
 
                         # exclude any blank entries (blanked after previous filtering)
                         # as well as some weird corner-case matches due to GOG's versioning madness
@@ -762,9 +828,9 @@ if __name__ == "__main__":
                                 installer_version_delta_entry_count = db_cursor.fetchone()[0]
 
                                 if installer_version_delta_entry_count != 0:
-                                    logger.debug(f'Discrepancy already logged for {current_product_id}: {current_product_title}, {current_os_value}. Skipping.')
+                                    logger.debug('Discrepancy already logged for %s: %s, %s. Skipping.', current_product_id, current_product_title, current_os_value)
                                 else:
-                                    logger.debug(f'Found outdated discrepancy for {current_product_id}: {current_product_title}, {current_os_value}.')
+                                    logger.debug('Found outdated discrepancy for %s: %s, %s.', current_product_id, current_product_title, current_os_value)
                                     # gid_int_updated, gid_int_latest_galaxy_build,
                                     # gid_int_latest_installer_version, gid_int_id, gid_int_os
                                     db_cursor.execute(UPDATE_INSTALLERS_DELTA_QUERY, (datetime.now().isoformat(' '), current_latest_build_version_orig,
@@ -782,7 +848,7 @@ if __name__ == "__main__":
                                         logger.warning(f'False positive status has been reset for {current_product_id}, {current_os_value}.')
 
                             else:
-                                logger.debug(f'Found new discrepancy for {current_product_id}: {current_product_title}, {current_os_value}.')
+                                logger.debug('Found new discrepancy for %s: %s, %s.', current_product_id, current_product_title, current_os_value)
                                 # gid_int_nr, gid_int_added, gid_int_fixed, gid_int_updated, gid_int_id, gid_int_title,
                                 # gid_int_os, gid_int_latest_galaxy_build, gid_int_latest_installer_version,
                                 # gid_int_false_positive, gid_int_false_positive_reason
@@ -793,7 +859,7 @@ if __name__ == "__main__":
                                 logger.info(f'+++ Successfully added an entry for {current_product_id}: {current_product_title}, {current_os_value}.')
 
                     else:
-                        logger.debug(f'Product with id {current_product_id} is on the exclusion list. Skipping.')
+                        logger.debug('Product with id %s is on the exclusion list. Skipping.', current_product_id)
 
                 # verify if previosly logged discrepancies have been fixed
                 db_cursor.execute('SELECT DISTINCT gid_int_id, gid_int_title, gid_int_os FROM gog_installers_delta WHERE gid_int_fixed IS NULL ORDER BY 1')
@@ -805,7 +871,7 @@ if __name__ == "__main__":
                     current_os_value = discrepancy[2]
 
                     if current_product_id not in detected_discrepancies[current_os_value]:
-                        logger.debug(f'Discrepancy for {current_product_id}: {current_product_title}, {current_os_value} has been fixed.')
+                        logger.debug('Discrepancy for %s: %s, %s has been fixed.', current_product_id, current_product_title, current_os_value)
                         # also clear any existing manually set reason if a false positive entry is marked as resolved
                         db_cursor.execute('UPDATE gog_installers_delta SET gid_int_fixed = ?, gid_int_false_positive = 0, gid_int_false_positive_reason = NULL '
                                           'WHERE gid_int_id = ? AND gid_int_os = ? AND gid_int_fixed IS NULL',
@@ -813,8 +879,7 @@ if __name__ == "__main__":
                         db_connection.commit()
                         logger.info(f'--- Successfully updated fixed status for {current_product_id}: {current_product_title}, {current_os_value}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -838,7 +903,7 @@ if __name__ == "__main__":
             raise SystemExit(0)
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 for product_id in id_list:
                     logger.info(f'Running scan for id {product_id}...')
 
@@ -866,8 +931,7 @@ if __name__ == "__main__":
                                     fail_event.set()
                                     terminate_event.set()
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -877,7 +941,7 @@ if __name__ == "__main__":
         logger.info('--- Running in REMOVED scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT DISTINCT gb_int_id FROM gog_builds WHERE gb_int_removed IS NOT NULL ORDER BY 1')
                 id_list = db_cursor.fetchall()
                 logger.debug('Retrieved all removed build ids from the DB...')
@@ -914,8 +978,7 @@ if __name__ == "__main__":
                     else:
                         logger.warning(f'Skipping the following id: {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
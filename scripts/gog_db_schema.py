@@ -118,7 +118,9 @@ CREATE_GOG_PRODUCTS_QUERY = ('CREATE TABLE gog_products (gp_int_nr INTEGER PRIMA
                              'gp_v2_links_forum TEXT, '
                              'gp_v2_description TEXT, '
                              'gp_languages TEXT, '
-                             'gp_changelog TEXT)')
+                             'gp_changelog TEXT, '
+                             'gp_int_json_hash TEXT, '
+                             'gp_int_v2_json_hash TEXT)')
 
 CREATE_GOG_RATINGS_QUERY = ('CREATE TABLE gog_ratings (grt_int_nr INTEGER PRIMARY KEY, '
                             'grt_int_added TEXT NOT NULL, '
@@ -151,13 +153,34 @@ CREATE_GOG_RELEASES_QUERY = ('CREATE TABLE gog_releases (gr_int_nr INTEGER PRIMA
                              'gr_visible_in_library INTEGER NOT NULL, '
                              'gr_aggregated_rating REAL)')
 
+# partial index covering delisted ids only (used by delisted scans and price archiving)
+CREATE_GP_INT_DELISTED_ID_INDEX_QUERY = ('CREATE INDEX IF NOT EXISTS gp_int_delisted_id_index ON gog_products (gp_id) '
+                                         'WHERE gp_int_delisted IS NOT NULL')
+# covering index for the per-product state lookups done by product scans; the hash columns are stored
+# after the (large) json payloads, so reading them from the table itself means walking the overflow pages
+CREATE_GP_ID_LOOKUP_INDEX_QUERY = ('CREATE INDEX IF NOT EXISTS gp_id_lookup_index ON gog_products (gp_id, gp_int_delisted, '
+                                   'gp_int_json_hash, gp_int_v2_json_hash, gp_v2_title)')
+# partial index covering listed file entries of a given download type (used by file extract scans)
+CREATE_GF_INT_ID_DOWNLOAD_TYPE_INDEX_QUERY = ('CREATE INDEX IF NOT EXISTS gf_int_id_download_type_index ON gog_files '
+                                              '(gf_int_id, gf_int_download_type) WHERE gf_int_removed IS NULL')
+
+# table, column and column definition for any columns which may be missing
+# from DBs created with an older version of the schema (always added last)
+UPGRADE_COLUMNS = (('gog_products', 'gp_int_json_hash', 'TEXT'),
+                   ('gog_products', 'gp_int_v2_json_hash', 'TEXT'))
+# indexes which may be missing from DBs created with an older version of the schema
+UPGRADE_INDEX_QUERIES = (CREATE_GP_INT_DELISTED_ID_INDEX_QUERY, CREATE_GP_ID_LOOKUP_INDEX_QUERY,
+                         CREATE_GF_INT_ID_DOWNLOAD_TYPE_INDEX_QUERY)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description=('GOG DB schema (part of gog_gles) - a script to create the sqlite DB structure '
                                                   'for the other gog_gles utilities and maintain it.'))
 
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-c', '--create', help='Create the GOG DB and schema', action='store_true')
+    group.add_argument('-u', '--upgrade', help='Upgrade the schema of an existing GOG DB', action='store_true')
     group.add_argument('-v', '--vacuum', help='Vacuum (compact) the GOG DB', action='store_true')
+    group.add_argument('-m', '--maintenance', help='Vacuum the GOG DB and refresh its query planner statistics', action='store_true')
 
     args = parser.parse_args()
 
@@ -170,8 +193,12 @@ if __name__ == "__main__":
 
         if args.create:
             db_mode = 'create'
+        elif args.upgrade:
+            db_mode = 'upgrade'
         elif args.vacuum:
             db_mode = 'vacuum'
+        elif args.maintenance:
+            db_mode = 'maintenance'
 
     if db_mode == 'create':
         logger.info('--- Running in CREATE DB mode ---')
@@ -185,12 +212,15 @@ if __name__ == "__main__":
                 db_cursor.execute('CREATE UNIQUE INDEX gb_int_id_os_index ON gog_builds (gb_int_id, gb_int_os)')
                 db_cursor.execute(CREATE_GOG_FILES_QUERY)
                 db_cursor.execute('CREATE INDEX gf_int_id_index ON gog_files (gf_int_id)')
+                db_cursor.execute(CREATE_GF_INT_ID_DOWNLOAD_TYPE_INDEX_QUERY)
                 db_cursor.execute(CREATE_GOG_FORUMS_QUERY)
                 db_cursor.execute(CREATE_GOG_INSTALLERS_DELTA_QUERY)
                 db_cursor.execute('CREATE INDEX gid_int_id_os_index ON gog_installers_delta (gid_int_id, gid_int_os)')
                 db_cursor.execute(CREATE_GOG_PRICES_QUERY)
                 db_cursor.execute('CREATE INDEX gpr_int_id_index ON gog_prices (gpr_int_id)')
                 db_cursor.execute(CREATE_GOG_PRODUCTS_QUERY)
+                db_cursor.execute(CREATE_GP_INT_DELISTED_ID_INDEX_QUERY)
+                db_cursor.execute(CREATE_GP_ID_LOOKUP_INDEX_QUERY)
                 db_cursor.execute(CREATE_GOG_RATINGS_QUERY)
                 db_cursor.execute(CREATE_GOG_RELEASES_QUERY)
                 db_connection.commit()
@@ -199,6 +229,42 @@ if __name__ == "__main__":
         else:
             logger.error('Existing DB file detected. Please delete the existing file if you are attempting to recreate the DB!')
 
+    elif db_mode == 'upgrade':
+        logger.info('--- Running in UPGRADE DB mode ---')
+
+        if os.path.exists(DB_FILE_PATH):
+            logger.info('DB file detected. Upgrading the DB schema...')
+
+            with sqlite3.connect(DB_FILE_PATH) as db_connection:
+                db_cursor = db_connection.cursor()
+                # the schema version is bumped by any added column or index
+                db_cursor.execute('PRAGMA schema_version')
+                schema_version = db_cursor.fetchone()[0]
+
+                for table_name, column_name, column_definition in UPGRADE_COLUMNS:
+                    db_cursor.execute(f'PRAGMA table_info({table_name})')
+                    existing_columns = [table_info[1] for table_info in db_cursor.fetchall()]
+
+                    if column_name not in existing_columns:
+                        logger.info(f'Adding the {column_name} column to the {table_name} table...')
+                        db_cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}')
+
+                for index_query in UPGRADE_INDEX_QUERIES:
+                    db_cursor.execute(index_query)
+
+                db_connection.commit()
+
+                db_cursor.execute('PRAGMA schema_version')
+                if db_cursor.fetchone()[0] != schema_version:
+                    # refresh the planner statistics, otherwise any new indexes may get ignored
+                    db_cursor.execute('ANALYZE')
+                    db_connection.commit()
+                    logger.info('Upgrade completed.')
+                else:
+                    logger.info('The DB schema is already up to date.')
+        else:
+            logger.error('No DB file detected. Nothing to upgrade!')
+
     elif db_mode == 'vacuum':
         logger.info('--- Running in VACUUM DB mode ---')
 
@@ -213,3 +279,25 @@ if __name__ == "__main__":
             logger.info('Vacuuming completed.')
         else:
             logger.error('No DB file detected. Nothing to Vacuum!')
+
+    elif db_mode == 'maintenance':
+        logger.info('--- Running in MAINTENANCE DB mode ---')
+
+        if os.path.exists(DB_FILE_PATH):
+            logger.info('DB file detected. Running DB maintenance...')
+
+            with sqlite3.connect(DB_FILE_PATH) as db_connection:
+                db_cursor = db_connection.cursor()
+                # vacuum first, so that ANALYZE collects statistics on the compacted tables & indexes
+                logger.info('Vacuuming the DB...')
+                db_cursor.execute('VACUUM')
+                db_connection.commit()
+                logger.info('Analyzing the DB...')
+                db_cursor.execute('ANALYZE')
+                db_connection.commit()
+                db_cursor.execute('PRAGMA optimize')
+                db_connection.commit()
+
+            logger.info('Maintenance completed.')
+        else:
+            logger.error('No DB file detected. Nothing to maintain!')
@@ -16,8 +16,10 @@ import os
 from shutil import copy2
 from configparser import ConfigParser
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from time import sleep
 from lxml import html as lhtml
+from lxml import etree
 from logging.handlers import RotatingFileHandler
 # uncomment for debugging purposes only
 #import traceback
@@ -44,8 +46,32 @@ DB_FILE_PATH = os.path.join('..', 'output_db', 'gog_gles.db')
 INSERT_FORUM_QUERY = 'INSERT INTO gog_forums VALUES (?,?,?,?,?)'
 
 OPTIMIZE_QUERY = 'PRAGMA optimize'
-
+# fully checkpoint and reset the WAL file once a scan is complete
+WAL_CHECKPOINT_QUERY = 'PRAGMA wal_checkpoint(TRUNCATE)'
+# WAL journaling lets the scan processes keep reading while another one is writing, and with
+# synchronous=NORMAL commits no longer wait on an fsync (the DB can't get corrupted, though
+# the last few commits may be lost on power failure, which a rescan will fix anyway)
+CONNECTION_PRAGMA_QUERIES = ('PRAGMA journal_mode=WAL',
+                             'PRAGMA synchronous=NORMAL',
+                             'PRAGMA temp_store=MEMORY',
+                             'PRAGMA cache_size=-20000',
+                             # memory map (up to) the first 256 MB of the DB file, to save on read syscalls
+                             'PRAGMA mmap_size=268435456')
+
+# number of seconds a connection will wait for the DB lock to be released by other processes
+DB_BUSY_TIMEOUT = 5 #seconds
 HTTP_OK = 200
+# number of hosts for which keep-alive connections are pooled by a session
+HTTP_POOL_CONNECTIONS = 4
+# number of keep-alive connections which are kept open for any given host
+HTTP_POOL_MAXSIZE = 10
+# the forums list is parsed with a reusable HTML parser (there's no need to keep track of element ids)
+FORUMS_HTML_PARSER = lhtml.HTMLParser(encoding='utf-8', collect_ids=False)
+# compiled XPath expression for the forum links, since it's used on every forums scan
+FORUM_LINKS_XPATH = etree.XPath('//div[contains(@class, "name")]/a[contains(@href, "")]')
+# relative XPath expressions, evaluated once for every parsed forum link
+FORUM_NAME_XPATH = etree.XPath('text()')
+FORUM_HREF_XPATH = etree.XPath('@href')
 
 def sigterm_handler(signum, frame):
     logger.debug('Stopping scan due to SIGTERM...')
@@ -57,6 +83,31 @@ def sigint_handler(signum, frame):
 
     raise SystemExit(0)
 
+def gog_session():
+    session = requests.Session()
+    # retries are handled by the scan logic, so only tune connection pooling here
+    http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', http_adapter)
+
+    return session
+
+def gog_db_connect():
+    db_connection = sqlite3.connect(DB_FILE_PATH, timeout=DB_BUSY_TIMEOUT)
+
+    for pragma_query in CONNECTION_PRAGMA_QUERIES:
+        db_connection.execute(pragma_query)
+
+    return db_connection
+
+def gog_db_checkpoint(db_connection, optimize=True):
+    if optimize:
+        logger.debug('Running PRAGMA optimize...')
+        db_connection.execute(OPTIMIZE_QUERY)
+    # any pending changes need to be committed in order to be checkpointed
+    db_connection.commit()
+    logger.debug('Running WAL checkpoint...')
+    db_connection.execute(WAL_CHECKPOINT_QUERY)
+
 def gog_forums_query(session, db_connection):
 
     forums_url = 'https://www.gog.com/forum/ajax?a=getArrayList&s=Find%20specific%20forum...&showAll=1'
@@ -66,43 +117,47 @@ def gog_forums_query(session, db_connection):
     try:
         response = session.get(forums_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'FRQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('FRQ >>> HTTP response code: %s.', response.status_code)
 
         if response.status_code == HTTP_OK:
-            html_tree = lhtml.fromstring(response.text)
+            html_tree = lhtml.fromstring(response.content, parser=FORUMS_HTML_PARSER)
+            # use the same timestamp for all the entries added/removed during a scan
+            current_timestamp = datetime.now().isoformat(' ')
+
+            parent_divs = FORUM_LINKS_XPATH(html_tree)
 
-            parent_divs = html_tree.xpath('//div[contains(@class, "name")]/a[contains(@href, "")]')
+            # load all existing entries upfront, rather than querying the DB for every parsed forum
+            db_cursor = db_connection.execute('SELECT gfr_name, gfr_int_removed, gfr_link FROM gog_forums')
+            existing_forums = {forum_entry[0]: forum_entry[1:] for forum_entry in db_cursor.fetchall()}
 
             for child_div in parent_divs:
-                forum_name = child_div.xpath('text()')[0].strip()
+                forum_name = FORUM_NAME_XPATH(child_div)[0].strip()
                 detected_forum_names.append(f'"{forum_name}"')
                 # parsed forum links contain a # referece in them, but that's not really worth storing
-                forum_link = 'https://www.gog.com' + child_div.xpath('@href')[0].split('#')[0]
-                logger.debug(f'FRQ >>> Parsed entry with forum name: {forum_name}, forum link: {forum_link}')
+                forum_link = 'https://www.gog.com' + FORUM_HREF_XPATH(child_div)[0].split('#')[0]
+                logger.debug('FRQ >>> Parsed entry with forum name: %s, forum link: %s', forum_name, forum_link)
 
-                db_cursor = db_connection.execute('SELECT COUNT(*) FROM gog_forums WHERE gfr_name = ?', (forum_name,))
-                entry_count = db_cursor.fetchone()[0]
-
-                if entry_count == 0:
+                if forum_name not in existing_forums:
                     # gfr_int_nr, gfr_int_added, gfr_int_removed, gfr_name, gfr_link
-                    db_cursor.execute(INSERT_FORUM_QUERY, (None, datetime.now().isoformat(' '), None, forum_name, forum_link))
+                    db_cursor.execute(INSERT_FORUM_QUERY, (None, current_timestamp, None, forum_name, forum_link))
                     db_connection.commit()
+                    # in case the same forum gets listed more than once
+                    existing_forums[forum_name] = (None, forum_link)
                     logger.info(f'FRQ +++ Added a new DB entry for {forum_name}.')
 
-                elif entry_count == 1:
-                    db_cursor.execute('SELECT gfr_int_removed, gfr_link FROM gog_forums WHERE gfr_name = ?', (forum_name,))
-                    existing_removed, existing_link = db_cursor.fetchone()
+                else:
+                    existing_removed, existing_link = existing_forums[forum_name]
 
                     # clear the removed status if a forum page is readded (should only happen rarely)
                     if existing_removed is not None:
-                        logger.debug(f'FRQ >>> Found a previously removed entry with name {forum_name}. Clearing removed status...')
+                        logger.debug('FRQ >>> Found a previously removed entry with name %s. Clearing removed status...', forum_name)
                         db_cursor.execute('UPDATE gog_forums SET gfr_int_removed = NULL WHERE gfr_name = ?', (forum_name,))
                         db_connection.commit()
                         logger.info(f'FRQ *** Cleared removed status for {forum_name}.')
 
                     # this should be very unlikely, yet properly update it if the link gets changed for some reason
                     if existing_link != forum_link:
-                        logger.debug(f'FRQ >>> Existing entry for {forum_name} is outdated. Updating...')
+                        logger.debug('FRQ >>> Existing entry for %s is outdated. Updating...', forum_name)
                         db_cursor.execute('UPDATE gog_forums SET gfr_link = ? WHERE gfr_name = ?', (forum_link, forum_name))
                         db_connection.commit()
                         logger.info(f'FRQ ~~~ Updated the DB entry for {forum_name}.')
@@ -122,9 +177,9 @@ def gog_forums_query(session, db_connection):
                 forum_name_list = [forum_name[0] for forum_name in db_cursor.fetchall()]
 
                 for forum_name in forum_name_list:
-                    logger.debug(f'FRQ >>> Forum {forum_name} has been removed...')
+                    logger.debug('FRQ >>> Forum %s has been removed...', forum_name)
                     db_cursor.execute('UPDATE gog_forums SET gfr_int_removed = ? WHERE gfr_name = ?',
-                                      (datetime.now().isoformat(' '), forum_name))
+                                      (current_timestamp, forum_name))
                     db_connection.commit()
                     logger.warning(f'FRQ --- Marked the DB entry for {forum_name} as removed.')
 
@@ -215,7 +270,7 @@ if __name__ == "__main__":
     logger.info('--- Running in FULL scan mode ---')
 
     try:
-        with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+        with gog_session() as session, gog_db_connect() as db_connection:
             retries_complete = False
             retry_counter = 0
 
@@ -239,8 +294,7 @@ if __name__ == "__main__":
                         fail_signal = True
                         terminate_signal = True
 
-            logger.debug('Running PRAGMA optimize...')
-            db_connection.execute(OPTIMIZE_QUERY)
+            gog_db_checkpoint(db_connection)
 
     except SystemExit:
         terminate_signal = True
@@ -18,9 +18,14 @@ from sys import argv
 from shutil import copy2
 from configparser import ConfigParser
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from time import sleep
-from collections import OrderedDict
 from logging.handlers import RotatingFileHandler
+try:
+    # optional, but a lot faster at parsing large API payloads
+    import orjson
+except ImportError:
+    orjson = None
 # uncomment for debugging purposes only
 #import traceback
 
@@ -44,10 +49,36 @@ DB_FILE_PATH = os.path.join('..', 'output_db', 'gog_gles.db')
 
 # CONSTANTS
 INSERT_PRICES_QUERY = 'INSERT INTO gog_prices VALUES (?,?,?,?,?,?,?,?,?)'
+# current (not outdated) price entries of a product, for all currencies
+SELECT_CURRENT_PRICES_QUERY = ('SELECT gpr_currency, gpr_base_price, gpr_final_price FROM gog_prices '
+                               'WHERE gpr_int_id = ? AND gpr_int_outdated IS NULL AND gpr_int_country_code = ?')
+# outdates the current price entry of a product in a given currency
+OUTDATE_PRICE_QUERY = ('UPDATE gog_prices SET gpr_int_outdated = ? WHERE gpr_int_id = ? AND gpr_int_outdated IS NULL '
+                       'AND gpr_int_country_code = ? AND gpr_currency = ?')
+# outdates the current price entries of all delisted products in all currencies
+ARCHIVE_PRICES_QUERY = ('UPDATE gog_prices SET gpr_int_outdated = ? WHERE gpr_int_outdated IS NULL AND gpr_int_country_code = ? '
+                        'AND gpr_int_id IN (SELECT gp_id FROM gog_products WHERE gp_int_delisted IS NOT NULL)')
 
 OPTIMIZE_QUERY = 'PRAGMA optimize'
-
+# fully checkpoint and reset the WAL file once a scan is complete
+WAL_CHECKPOINT_QUERY = 'PRAGMA wal_checkpoint(TRUNCATE)'
+# WAL journaling lets the scan processes keep reading while another one is writing, and with
+# synchronous=NORMAL commits no longer wait on an fsync (the DB can't get corrupted, though
+# the last few commits may be lost on power failure, which a rescan will fix anyway)
+CONNECTION_PRAGMA_QUERIES = ('PRAGMA journal_mode=WAL',
+                             'PRAGMA synchronous=NORMAL',
+                             'PRAGMA temp_store=MEMORY',
+                             'PRAGMA cache_size=-20000',
+                             # memory map (up to) the first 256 MB of the DB file, to save on read syscalls
+                             'PRAGMA mmap_size=268435456')
+
+# number of seconds a connection will wait for the DB lock to be released by other processes
+DB_BUSY_TIMEOUT = 5 #seconds
 HTTP_OK = 200
+# number of hosts for which keep-alive connections are pooled by a session
+HTTP_POOL_CONNECTIONS = 4
+# number of keep-alive connections which are kept open for any given host
+HTTP_POOL_MAXSIZE = 10
 
 def sigterm_handler(signum, frame):
     logger.debug('Stopping scan due to SIGTERM...')
@@ -59,6 +90,42 @@ def sigint_handler(signum, frame):
 
     raise SystemExit(0)
 
+def gog_session():
+    session = requests.Session()
+    # retries are handled by the scan logic, so only tune connection pooling here
+    http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', http_adapter)
+
+    return session
+
+def gog_db_connect():
+    db_connection = sqlite3.connect(DB_FILE_PATH, timeout=DB_BUSY_TIMEOUT)
+
+    for pragma_query in CONNECTION_PRAGMA_QUERIES:
+        db_connection.execute(pragma_query)
+
+    return db_connection
+
+def gog_db_checkpoint(db_connection, optimize=True):
+    if optimize:
+        logger.debug('Running PRAGMA optimize...')
+        db_connection.execute(OPTIMIZE_QUERY)
+    # any pending changes need to be committed in order to be checkpointed
+    db_connection.commit()
+    logger.debug('Running WAL checkpoint...')
+    db_connection.execute(WAL_CHECKPOINT_QUERY)
+
+def json_loads(json_content):
+    if orjson is not None:
+        try:
+            return orjson.loads(json_content)
+        # orjson is stricter than the json module (e.g. when it comes to
+        # lone surrogates), so give any rejected payloads a second chance
+        except orjson.JSONDecodeError:
+            pass
+
+    return json.loads(json_content)
+
 def gog_prices_query(product_id, country_code, currencies_list, session, db_connection):
 
     prices_url = f'https://api.gog.com/products/{product_id}/prices?countryCode={country_code}'
@@ -66,24 +133,30 @@ def gog_prices_query(product_id, country_code, currencies_list, session, db_conn
     try:
         response = session.get(prices_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'PQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('PQ >>> HTTP response code: %s.', response.status_code)
 
         if response.status_code == HTTP_OK:
-            json_parsed = json.loads(response.text, object_pairs_hook=OrderedDict)
+            json_parsed = json_loads(response.content)
 
             items = json_parsed['_embedded']['prices']
-            logger.debug(f'PQ >>> Items count: {len(items)}.')
+            logger.debug('PQ >>> Items count: %s.', len(items))
 
             if len(items) > 0:
-                logger.debug(f'PQ >>> Found something for id {product_id}...')
+                logger.debug('PQ >>> Found something for id %s...', product_id)
 
                 db_cursor = db_connection.execute('SELECT gp_title FROM gog_products WHERE gp_id = ?', (product_id,))
                 result = db_cursor.fetchone()
                 product_title = result[0]
+                # use the same timestamp for all the price entries of a product
+                current_timestamp = datetime.now().isoformat(' ')
+
+                # load all the current prices of the product upfront, rather than querying the DB for every currency
+                db_cursor.execute(SELECT_CURRENT_PRICES_QUERY, (product_id, country_code))
+                current_prices = {price_entry[0]: price_entry[1:] for price_entry in db_cursor.fetchall()}
 
                 for json_item in items:
                     currency = json_item['currency']['code']
-                    logger.debug(f'PQ >>> currency is: {currency}.')
+                    logger.debug('PQ >>> currency is: %s.', currency)
 
                     if currency in currencies_list or 'all' in currencies_list:
                         # remove currency value from all price values along with any whitespace
@@ -92,48 +165,41 @@ def gog_prices_query(product_id, country_code, currencies_list, session, db_conn
                             base_price = float(''.join((base_price_str[:-2], '.', base_price_str[-2:])))
                         else:
                             base_price = 0
-                        logger.debug(f'PQ >>> base_price is: {base_price}.')
+                        logger.debug('PQ >>> base_price is: %s.', base_price)
 
                         final_price_str = json_item['finalPrice'].replace(currency, '').strip()
                         if final_price_str != '0':
                             final_price = float(''.join((final_price_str[:-2], '.', final_price_str[-2:])))
                         else:
                             final_price = 0
-                        logger.debug(f'PQ >>> final_price is: {final_price}.')
-
-                        db_cursor.execute('SELECT COUNT(*) FROM gog_prices WHERE gpr_int_id = ? AND gpr_int_outdated IS NULL '
-                                          'AND gpr_int_country_code = ? AND gpr_currency = ? AND gpr_base_price = ? AND gpr_final_price = ?',
-                                          (product_id, country_code, currency, base_price, final_price))
-                        existing_entries = db_cursor.fetchone()[0]
-
-                        if existing_entries == 0:
-                            db_cursor.execute('SELECT COUNT(*) FROM gog_prices WHERE gpr_int_id = ? AND gpr_int_outdated IS NULL '
-                                              'AND gpr_int_country_code = ? AND gpr_currency = ?', (product_id, country_code, currency))
-                            previous_entries = db_cursor.fetchone()[0]
-
-                            if previous_entries == 1:
-                                db_cursor.execute('UPDATE gog_prices SET gpr_int_outdated = ? WHERE gpr_int_id = ? AND gpr_int_outdated IS NULL '
-                                                  'AND gpr_int_country_code = ? AND gpr_currency = ?',
-                                                  (datetime.now().isoformat(' '), product_id, country_code, currency))
+                        logger.debug('PQ >>> final_price is: %s.', final_price)
+
+                        existing_prices = current_prices.get(currency)
+
+                        if existing_prices != (base_price, final_price):
+                            if existing_prices is not None:
+                                db_cursor.execute(OUTDATE_PRICE_QUERY, (current_timestamp, product_id, country_code, currency))
                                 db_connection.commit()
-                                logger.debug(f'PQ ~~~ Succesfully outdated the previous DB entry for {product_id}: {product_title}, {country_code}, {currency}.')
+                                logger.debug('PQ ~~~ Succesfully outdated the previous DB entry for %s: %s, %s, %s.', product_id, product_title, country_code, currency)
 
                             # gpr_int_nr, gpr_int_added, gpr_int_outdated, gpr_int_id, gpr_int_title,
                             # gpr_int_country_code, gpr_currency, gpr_base_price, gpr_final_price
-                            db_cursor.execute(INSERT_PRICES_QUERY, (None, datetime.now().isoformat(' '), None, product_id, product_title,
+                            db_cursor.execute(INSERT_PRICES_QUERY, (None, current_timestamp, None, product_id, product_title,
                                                                     country_code, currency, base_price, final_price))
                             db_connection.commit()
+                            # in case the same currency gets listed more than once
+                            current_prices[currency] = (base_price, final_price)
                             logger.info(f'PQ +++ Added a DB entry for {product_id}: {product_title}, {country_code}, {currency}.')
 
-                        elif existing_entries == 1:
-                            logger.debug(f'PQ >>> Prices have not changed for {product_id}, {country_code}, {currency}. Skipping.')
+                        else:
+                            logger.debug('PQ >>> Prices have not changed for %s, %s, %s. Skipping.', product_id, country_code, currency)
 
                     else:
-                        logger.debug(f'PQ >>> {currency} is not in currencies_list. Skipping.')
+                        logger.debug('PQ >>> %s is not in currencies_list. Skipping.', currency)
 
         # HTTP error code 400, issued for products that are not sold or no longer sold
         elif response.status_code == 400:
-            logger.debug(f'PQ >>> HTTP error code 400 (Bad Request) received for {product_id}.')
+            logger.debug('PQ >>> HTTP error code 400 (Bad Request) received for %s.', product_id)
 
         else:
             logger.warning(f'PQ >>> HTTP error code {response.status_code} received for {product_id}.')
@@ -157,7 +223,7 @@ def gog_prices_query(product_id, country_code, currencies_list, session, db_conn
         return False
 
     except:
-        logger.debug(f'PQ >>> Prices query has failed for {product_id}, {country_code}, {currency}.')
+        logger.debug('PQ >>> Prices query has failed for %s, %s, %s.', product_id, country_code, currency)
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
         return False
@@ -201,8 +267,8 @@ if __name__ == "__main__":
 
         scan_mode = general_section.get('scan_mode')
         # ids that will be skipped, for one reason or another
-        SKIP_IDS = [int(product_id.strip()) for product_id in
-                    general_section.get('skip_ids').split(',') if product_id != '']
+        SKIP_IDS = frozenset(int(product_id.strip()) for product_id in
+                             general_section.get('skip_ids').split(',') if product_id != '')
         CONF_BACKUP = general_section.get('conf_backup')
         DB_BACKUP = general_section.get('db_backup')
         COUNTRY_CODE = general_section.get('country_code')
@@ -266,7 +332,7 @@ if __name__ == "__main__":
             logger.info(f'Restarting update scan from id: {last_id}.')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT gp_id FROM gog_products WHERE gp_id > ? AND '
                                                   'gp_int_delisted IS NULL ORDER BY 1', (last_id,))
                 id_list = db_cursor.fetchall()
@@ -278,7 +344,7 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
+                        logger.debug('Now processing id %s...', current_product_id)
                         retries_complete = False
                         retry_counter = 0
     
@@ -316,8 +382,7 @@ if __name__ == "__main__":
 
                         logger.info(f'Saved scan up to last_id of {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_signal = True
@@ -327,26 +392,24 @@ if __name__ == "__main__":
         logger.info('--- Running in ARCHIVE scan mode ---')
 
         try:
-            with sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT DISTINCT gpr_int_id, gpr_int_title FROM gog_prices WHERE gpr_int_outdated IS NULL '
                                                   'AND gpr_int_id IN (SELECT gp_id FROM gog_products WHERE gp_int_delisted IS NOT NULL '
                                                   'ORDER BY 1) ORDER BY 1')
                 id_list = db_cursor.fetchall()
                 logger.debug('Retrieved all applicable product ids from the DB...')
 
-                for id_entry in id_list:
-                    current_product_id = id_entry[0]
-                    current_product_title = id_entry[1]
-                    logger.debug(f'Now processing id {current_product_id}...')
-
-                    db_cursor.execute('UPDATE gog_prices SET gpr_int_outdated = ? WHERE gpr_int_id = ? AND gpr_int_outdated IS NULL '
-                                      'AND gpr_int_country_code = ?', (datetime.now().isoformat(' '), current_product_id, COUNTRY_CODE))
-                    logger.info(f'Succesfully outdated the DB entry for {current_product_id}: {current_product_title}, {COUNTRY_CODE}, all currencies.')
+                # all entries are outdated as part of the same archive scan, so use the same timestamp
+                archive_timestamp = datetime.now().isoformat(' ')
 
+                # outdate all the entries with a single statement, rather than once per id
+                db_cursor.execute(ARCHIVE_PRICES_QUERY, (archive_timestamp, COUNTRY_CODE))
                 db_connection.commit()
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                for current_product_id, current_product_title in id_list:
+                    logger.info(f'Succesfully outdated the DB entry for {current_product_id}: {current_product_title}, {COUNTRY_CODE}, all currencies.')
+
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_signal = True
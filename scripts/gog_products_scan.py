@@ -8,6 +8,7 @@ Warning: Built for use with python 3.6+
 '''
 
 import json
+import hashlib
 import multiprocessing
 import queue
 import sqlite3
@@ -17,15 +18,22 @@ import logging
 import argparse
 import difflib
 import re
+import random
 import os
 from sys import argv
 from shutil import copy2
 from configparser import ConfigParser
 from html2text import html2text
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from time import sleep
-from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import RotatingFileHandler
+try:
+    # optional, but a lot faster at parsing large API payloads
+    import orjson
+except ImportError:
+    orjson = None
 # uncomment for debugging purposes only
 #import traceback
 
@@ -49,13 +57,28 @@ logger.addHandler(logger_file_handler)
 DB_FILE_PATH = os.path.join('..', 'output_db', 'gog_gles.db')
 
 # CONSTANTS
-INSERT_ID_QUERY = 'INSERT INTO gog_products VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)'
+INSERT_ID_QUERY = 'INSERT INTO gog_products VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)'
 
 UPDATE_ID_QUERY = ('UPDATE gog_products SET gp_int_updated = ?, '
                    'gp_int_json_payload = ?, '
                    'gp_int_json_diff = ?, '
                    'gp_languages = ?, '
-                   'gp_changelog = ? WHERE gp_id = ?')
+                   'gp_changelog = ?, '
+                   'gp_int_json_hash = ? WHERE gp_id = ?')
+
+UPDATE_ID_HASH_QUERY = 'UPDATE gog_products SET gp_int_json_hash = ? WHERE gp_id = ?'
+
+UPDATE_ID_DELISTED_QUERY = ('UPDATE gog_products SET gp_int_delisted = ?, gp_int_json_diff = NULL, gp_int_v2_json_diff = NULL '
+                            'WHERE gp_id = ?')
+
+UPDATE_ID_RELISTED_QUERY = 'UPDATE gog_products SET gp_int_delisted = NULL WHERE gp_id = ?'
+
+SELECT_ID_ENTRY_QUERY = ('SELECT gp_int_delisted, gp_int_json_hash, gp_v2_title FROM gog_products '
+                         'INDEXED BY gp_id_lookup_index WHERE gp_id = ?')
+
+SELECT_ID_DELISTED_QUERY = 'SELECT gp_int_delisted, gp_v2_title FROM gog_products WHERE gp_id = ?'
+
+SELECT_ID_PAYLOAD_QUERY = 'SELECT gp_int_json_payload FROM gog_products WHERE gp_id = ?'
 
 UPDATE_ID_V2_QUERY = ('UPDATE gog_products SET gp_int_v2_updated = ?, '
                       'gp_int_v2_json_payload = ?, '
@@ -82,11 +105,47 @@ UPDATE_ID_V2_QUERY = ('UPDATE gog_products SET gp_int_v2_updated = ?, '
                       'gp_v2_links_store = ?, '
                       'gp_v2_links_support = ?, '
                       'gp_v2_links_forum = ?, '
-                      'gp_v2_description = ? WHERE gp_id = ?')
+                      'gp_v2_description = ?, '
+                      'gp_int_v2_json_hash = ? WHERE gp_id = ?')
+
+UPDATE_ID_V2_HASH_QUERY = 'UPDATE gog_products SET gp_int_v2_json_hash = ? WHERE gp_id = ?'
+
+SELECT_ID_V2_HASH_QUERY = 'SELECT gp_int_v2_json_hash FROM gog_products INDEXED BY gp_id_lookup_index WHERE gp_id = ?'
+
+SELECT_ID_V2_PAYLOAD_QUERY = 'SELECT gp_int_v2_json_payload FROM gog_products WHERE gp_id = ?'
 
 INSERT_FILES_QUERY = 'INSERT INTO gog_files VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)'
+SELECT_DOWNLOADS_QUERY = 'SELECT json_extract(gp_int_json_payload, \'$.downloads\') FROM gog_products WHERE gp_id = ?'
+# listed installer, patch and language_packs entries, ordered so that the lowest pk comes first
+SELECT_FILES_QUERY = ('SELECT gf_int_nr, gf_id, gf_os, gf_language, gf_version, gf_file_id, gf_file_size FROM gog_files '
+                      'WHERE gf_int_id = ? AND gf_int_download_type = ? AND gf_int_removed IS NULL ORDER BY 1')
+# bonus_content entries are not versioned, but come with a type and count instead
+SELECT_BONUS_CONTENT_FILES_QUERY = ('SELECT gf_int_nr, gf_id, gf_type, gf_count, gf_file_id, gf_file_size FROM gog_files '
+                                    'WHERE gf_int_id = ? AND gf_int_download_type = \'bonus_content\' AND gf_int_removed IS NULL ORDER BY 1')
+UPDATE_FILES_REMOVED_QUERY = 'UPDATE gog_files SET gf_int_removed = ? WHERE gf_int_nr = ? AND gf_int_removed IS NULL'
+# gog_files download types, along with the downloads section key their entries are listed under
+FILES_DOWNLOAD_TYPES = (('installer', 'installers'), ('patch', 'patches'),
+                        ('language_packs', 'language_packs'), ('bonus_content', 'bonus_content'))
+
+# columns added by gog_db_schema.py upgrades, which the scan queries rely on
+SELECT_TABLE_INFO_QUERY = 'PRAGMA table_info(gog_products)'
+REQUIRED_COLUMNS = ('gp_int_json_hash', 'gp_int_v2_json_hash')
+# INDEXED BY turns a missing index into a hard error for every id query
+SELECT_INDEX_QUERY = 'SELECT name FROM sqlite_master WHERE type = \'index\' AND name = ?'
+REQUIRED_INDEX = 'gp_id_lookup_index'
 
 OPTIMIZE_QUERY = 'PRAGMA optimize'
+# fully checkpoint and reset the WAL file once a scan is complete
+WAL_CHECKPOINT_QUERY = 'PRAGMA wal_checkpoint(TRUNCATE)'
+# WAL journaling lets the scan processes keep reading while another one is writing, and with
+# synchronous=NORMAL commits no longer wait on an fsync (the DB can't get corrupted, though
+# the last few commits may be lost on power failure, which a rescan will fix anyway)
+CONNECTION_PRAGMA_QUERIES = ('PRAGMA journal_mode=WAL',
+                             'PRAGMA synchronous=NORMAL',
+                             'PRAGMA temp_store=MEMORY',
+                             'PRAGMA cache_size=-20000',
+                             # memory map (up to) the first 256 MB of the DB file, to save on read syscalls
+                             'PRAGMA mmap_size=268435456')
 
 # number of retries after which an id is considered parmenently delisted (for archive mode)
 ARCHIVE_NO_OF_RETRIES = 3
@@ -94,14 +153,33 @@ ARCHIVE_NO_OF_RETRIES = 3
 ENDLINE_FIX_REGEX = re.compile(r'([ ]*[\n]){2,}')
 # value separator for multi-valued fields
 MVF_VALUE_SEPARATOR = '; '
+# combined size (in characters) of the old and new json payloads above which no diff will be stored
+DIFF_SIZE_LIMIT = 1048576
 # supported product OSes, as returned by the v2 API endpoint
 SUPPORTED_OSES = ('windows', 'linux', 'osx')
+# catalog query parameters for the new arrival and upcoming product listings
+NEW_ARRIVALS_CATALOG_PARAMETERS = 'limit=48&releaseStatuses=in:new-arrival&order=desc:releaseDate&productType=in:game,pack,dlc,extras'
+UPCOMING_CATALOG_PARAMETERS = 'limit=48&releaseStatuses=in:upcoming&order=desc:releaseDate&productType=in:game,pack,dlc,extras'
+# locales and currency don't matter here, but emulate default GOG website behavior
+CATALOG_LOCALE_PARAMETERS = '&countryCode=BE&locale=en-US&currencyCode=EUR'
 # number of seconds a process will wait to get/put in a queue
 QUEUE_WAIT_TIMEOUT = 10 #seconds
 # allow a process to fully load before starting the next process
 # (helps preserve process start order for logging purposes)
 PROCESS_START_WAIT_INTERVAL = 0.05 #seconds
+# upper bound of the random jitter added to retry sleeps
+RETRY_SLEEP_JITTER = 2 #seconds
 HTTP_OK = 200
+# number of seconds a connection will wait for the DB lock to be released by other processes
+DB_BUSY_TIMEOUT = 5 #seconds
+# number of hosts (api, catalog, www) for which keep-alive connections are pooled by a session
+HTTP_POOL_CONNECTIONS = 4
+# number of keep-alive connections which are kept open for any given host
+HTTP_POOL_MAXSIZE = 10
+# number of threads used to process the ids collected during new, builds and releases scans
+ID_SCAN_THREADS = 4
+# number of threads used to fetch the remaining pages of a catalog listing, once the page count is known
+CATALOG_PAGE_THREADS = 4
 # non-standard unicode values (either encoded or not) which need to be purged from the JSON API output;
 # the state of being encoded or not encoded in the original text output seems to depend on some form
 # of unicode string black magic that I can't quite understand...
@@ -125,12 +203,65 @@ def sigint_handler(signum, frame):
 
     raise SystemExit(0)
 
+def retry_sleep_interval(retry_counter):
+    # incremental sleep, so that sustained throttling gets more time to clear up, with some
+    # added jitter so that concurrent retries don't all hit the API at the same time
+    return (INCREMENTAL_RETRY_BASE ** (retry_counter - 1)) * RETRY_SLEEP_INTERVAL + random.uniform(0, RETRY_SLEEP_JITTER)
+
+def gog_session():
+    session = requests.Session()
+    # retries are handled by the scan logic, so only tune connection pooling here
+    http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', http_adapter)
+
+    return session
+
+def gog_db_connect():
+    db_connection = sqlite3.connect(DB_FILE_PATH, timeout=DB_BUSY_TIMEOUT)
+
+    for pragma_query in CONNECTION_PRAGMA_QUERIES:
+        db_connection.execute(pragma_query)
+
+    return db_connection
+
+def gog_db_checkpoint(db_connection, optimize=True):
+    if optimize:
+        logger.debug('Running PRAGMA optimize...')
+        db_connection.execute(OPTIMIZE_QUERY)
+    # any pending changes need to be committed in order to be checkpointed
+    db_connection.commit()
+    logger.debug('Running WAL checkpoint...')
+    db_connection.execute(WAL_CHECKPOINT_QUERY)
+
+def gog_db_schema_check():
+    with gog_db_connect() as db_connection:
+        db_cursor = db_connection.execute(SELECT_TABLE_INFO_QUERY)
+        existing_columns = frozenset(column_info[1] for column_info in db_cursor.fetchall())
+        db_cursor = db_connection.execute(SELECT_INDEX_QUERY, (REQUIRED_INDEX,))
+        index_present = db_cursor.fetchone() is not None
+
+    return index_present and all(column in existing_columns for column in REQUIRED_COLUMNS)
+
+def json_loads(json_content):
+    if orjson is not None:
+        try:
+            return orjson.loads(json_content)
+        # orjson is stricter than the json module (e.g. when it comes to
+        # lone surrogates), so give any rejected payloads a second chance
+        except orjson.JSONDecodeError:
+            pass
+
+    # plain dicts keep insertion order and keys get sorted when dumped anyway, so there's no need for an OrderedDict
+    return json.loads(json_content)
+
 def parse_html_data(html_content):
-    # need to correct some GOG formatting wierdness by using regular expressions
-    html_content_parsed = ENDLINE_FIX_REGEX.sub('\n\n', html2text(html_content, bodywidth=0).strip())
-    if html_content_parsed == '': html_content_parsed = None
+    # plenty of products have empty descriptions/changelogs, so don't bother running html2text on those
+    if not html_content:
+        return None
 
-    return html_content_parsed
+    # need to correct some GOG formatting wierdness by using regular expressions
+    # (content which is left blank after parsing is also stored as None)
+    return ENDLINE_FIX_REGEX.sub('\n\n', html2text(html_content, bodywidth=0).strip()) or None
 
 def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connection):
 
@@ -139,51 +270,67 @@ def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connectio
     try:
         response = session.get(product_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'{process_tag}2Q >>> HTTP response code: {response.status_code}.')
+        logger.debug('%s2Q >>> HTTP response code: %s.', process_tag, response.status_code)
 
         if response.status_code == HTTP_OK:
-            logger.debug(f'{process_tag}2Q >>> Product v2 query for id {product_id} has returned a valid response...')
+            logger.debug('%s2Q >>> Product v2 query for id %s has returned a valid response...', process_tag, product_id)
+
+            # an identical response hash means there is nothing to update, so skip parsing & comparing the payload
+            json_v2_hash = hashlib.sha256(response.content).hexdigest()
+            db_cursor = db_connection.execute(SELECT_ID_V2_HASH_QUERY, (product_id,))
+            existing_v2_json_hash = db_cursor.fetchone()[0]
+
+            if existing_v2_json_hash == json_v2_hash:
+                logger.debug('%s2Q >>> Unchanged v2 response hash for %s. Skipping.', process_tag, product_id)
+                return
 
             # ignore unicode control characters which can be part of game descriptions and/or changelogs;
             # these chars do absolutely nothing relevant but can mess with SQL imports/export and sometimes
             # even with unicode conversions from and to the db... why do you do this, GOG, why???
-            filtered_response = JSON_UNICODE_REMOVAL_REGEX.sub('', response.text)
+            filtered_response = JSON_UNICODE_REMOVAL_REGEX.sub('', response.content.decode('utf-8'))
 
-            json_v2_parsed = json.loads(filtered_response, object_pairs_hook=OrderedDict)
+            json_v2_parsed = json_loads(filtered_response)
             json_v2_formatted = json.dumps(json_v2_parsed, sort_keys=True, indent=4, separators=(',', ': '), ensure_ascii=False)
 
-            db_cursor = db_connection.execute('SELECT gp_int_v2_json_payload FROM gog_products WHERE gp_id = ?', (product_id,))
+            db_cursor.execute(SELECT_ID_V2_PAYLOAD_QUERY, (product_id,))
             existing_v2_json_formatted = db_cursor.fetchone()[0]
 
             if existing_v2_json_formatted != json_v2_formatted:
                 if existing_v2_json_formatted is not None:
-                    logger.debug(f'{process_tag}2Q >>> Existing v2 data for {product_id} is outdated. Updating...')
+                    logger.debug('%s2Q >>> Existing v2 data for %s is outdated. Updating...', process_tag, product_id)
 
                 # calculate the diff between the new json and the previous one
                 # (applying the diff on the new json will revert to the previous version)
-                if existing_v2_json_formatted is not None:
-                    diff_v2_formatted = ''.join([line for line in difflib.unified_diff(json_v2_formatted.splitlines(1),
-                                                                                       existing_v2_json_formatted.splitlines(1), n=0)])
-                else:
+                if existing_v2_json_formatted is None:
+                    diff_v2_formatted = None
+                # difflib can take ages to process very large payloads, so skip the diff in that case
+                elif len(existing_v2_json_formatted) + len(json_v2_formatted) > DIFF_SIZE_LIMIT:
+                    logger.warning(f'{process_tag}2Q >>> The v2 data for {product_id} is too large to diff. Skipping diff.')
                     diff_v2_formatted = None
+                else:
+                    diff_v2_formatted = ''.join(difflib.unified_diff(json_v2_formatted.splitlines(keepends=True),
+                                                                     existing_v2_json_formatted.splitlines(keepends=True), n=0))
 
+                # most of the fields are nested under _embedded, so only look it up once
+                embedded_data = json_v2_parsed['_embedded']
+                embedded_product = embedded_data['product']
                 # process product title
-                product_title = json_v2_parsed['_embedded']['product']['title'].strip()
+                product_title = embedded_product['title'].strip()
                 # process product type
-                product_type = json_v2_parsed['_embedded']['productType']
+                product_type = embedded_data['productType']
                 # process developer/publisher
-                developer = json_v2_parsed['_embedded']['developers'][0]['name'].strip()
-                publisher = json_v2_parsed['_embedded']['publisher']['name'].strip()
+                developer = embedded_data['developers'][0]['name'].strip()
+                publisher = embedded_data['publisher']['name'].strip()
                 # process size (MB value)
                 size = json_v2_parsed['size']
                 # process preorder status
-                is_preorder = json_v2_parsed['_embedded']['product']['isPreorder']
+                is_preorder = embedded_product['isPreorder']
                 # process in development status
                 in_development = json_v2_parsed['inDevelopment']['active']
                 # process installable status
-                is_installable = json_v2_parsed['_embedded']['product']['isInstallable']
+                is_installable = embedded_product['isInstallable']
                 # process individual os support
-                supported_oses = json_v2_parsed['_embedded']['supportedOperatingSystems']
+                supported_oses = embedded_data['supportedOperatingSystems']
                 os_support_windows = False
                 os_support_linux = False
                 os_support_osx = False
@@ -200,7 +347,7 @@ def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connectio
                                                                  if os_value['operatingSystem']['versions'] != '')
                 # process global release date
                 try:
-                    global_release_date = json_v2_parsed['_embedded']['product']['globalReleaseDate']
+                    global_release_date = embedded_product['globalReleaseDate']
                     if global_release_date is not None:
                         # ISO 8601 allows omitting the T delimiter in the extended format
                         # and sqlite datetime functions use RFC 3339, which omits it by default
@@ -208,30 +355,27 @@ def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connectio
                 except KeyError:
                     global_release_date = None
                 # process GOG release date
-                gog_release_date = json_v2_parsed['_embedded']['product']['gogReleaseDate']
+                gog_release_date = embedded_product['gogReleaseDate']
                 if gog_release_date is not None:
                     # ISO 8601 allows omitting the T delimiter in the extended format
                     # and sqlite datetime functions use RFC 3339, which omits it by default
                     gog_release_date = gog_release_date.replace('T', ' ')
                 # process tags
-                tags = MVF_VALUE_SEPARATOR.join(sorted([tag['name'] for tag in json_v2_parsed['_embedded']['tags']]))
-                if tags == '': tags = None
+                tags = MVF_VALUE_SEPARATOR.join(sorted(tag['name'] for tag in embedded_data['tags'])) or None
                 # process properties (tee is used for avoiding a reserved name) - the field may be absent and return a KeyError
                 try:
                     # ideally should not need a strip, but there are a few entries with extra whitespace here and there
-                    properties = MVF_VALUE_SEPARATOR.join(sorted([propertee['name'].strip() for propertee in
-                                                                  json_v2_parsed['_embedded']['properties']]))
-                    if properties == '': properties = None
+                    properties = MVF_VALUE_SEPARATOR.join(sorted(propertee['name'].strip() for propertee in
+                                                                 embedded_data['properties'])) or None
                 except KeyError:
                     properties = None
                 # process series - these may be 'null' and return a TypeError
                 try:
-                    series = json_v2_parsed['_embedded']['series']['name'].strip()
+                    series = embedded_data['series']['name'].strip()
                 except TypeError:
                     series = None
                 # process features
-                features = MVF_VALUE_SEPARATOR.join(sorted([feature['name'] for feature in json_v2_parsed['_embedded']['features']]))
-                if features == '': features = None
+                features = MVF_VALUE_SEPARATOR.join(sorted(feature['name'] for feature in embedded_data['features'])) or None
                 # process is_using_dosbox
                 is_using_dosbox = json_v2_parsed['isUsingDosBox']
                 # proces links
@@ -239,12 +383,9 @@ def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connectio
                 links_support = json_v2_parsed['_links']['support']['href']
                 links_forum = json_v2_parsed['_links']['forum']['href']
                 # process description
-                try:
-                    description = parse_html_data(json_v2_parsed['description'])
-                    # ignore some bogus/placeholder descriptions (probably autogenerated)
-                    if description.startswith('product_description_'):
-                        description = None
-                except AttributeError:
+                description = parse_html_data(json_v2_parsed['description'])
+                # ignore some bogus/placeholder descriptions (probably autogenerated)
+                if description is not None and description.startswith('product_description_'):
                     description = None
 
                 with db_lock:
@@ -255,7 +396,7 @@ def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connectio
                     # gp_v2_supported_os_versions, gp_v2_global_release_date, gp_v2_gog_release_date,
                     # gp_v2_tags, gp_v2_properties, gp_vs_series, gp_v2_features,
                     # gp_v2_is_using_dosbox, gp_v2_links_store, gp_v2_links_support, gp_v2_links_forum,
-                    # gp_v2_description, gp_id (WHERE clause)
+                    # gp_v2_description, gp_int_v2_json_hash, gp_id (WHERE clause)
                     db_cursor.execute(UPDATE_ID_V2_QUERY, (datetime.now().isoformat(' '), json_v2_formatted,
                                                            diff_v2_formatted, product_title, product_type, developer,
                                                            publisher, size, is_preorder, in_development, is_installable,
@@ -263,7 +404,7 @@ def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connectio
                                                            supported_os_versions, global_release_date, gog_release_date,
                                                            tags, properties, series, features,
                                                            is_using_dosbox, links_store, links_support, links_forum,
-                                                           description, product_id))
+                                                           description, json_v2_hash, product_id))
                     db_connection.commit()
 
                 if existing_v2_json_formatted is not None:
@@ -271,6 +412,13 @@ def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connectio
                 else:
                     logger.info(f'{process_tag}2Q +++ Added v2 data for {product_id}: {product_title}.')
 
+            # the response differs only in ways which are not reflected in the stored payload
+            # (or no hash has been stored yet), so only store the new hash
+            else:
+                with db_lock:
+                    db_cursor.execute(UPDATE_ID_V2_HASH_QUERY, (json_v2_hash, product_id))
+                    db_connection.commit()
+
         # ids corresponding to movies will return a 404 error, others should not
         elif response.status_code == 404:
             logger.warning(f'{process_tag}2Q >>> Product with id {product_id} returned an HTTP 404 error code. Skipping.')
@@ -285,7 +433,7 @@ def gog_product_v2_query(process_tag, product_id, db_lock, session, db_connectio
         raise
 
     except:
-        logger.debug(f'{process_tag}2Q >>> Product company query has failed for {product_id}.')
+        logger.debug('%s2Q >>> Product v2 query has failed for %s.', process_tag, product_id)
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
         raise
@@ -309,67 +457,77 @@ def gog_product_extended_query(process_tag, product_id, scan_mode, db_lock, sess
     try:
         response = session.get(product_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'{process_tag}PQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('%sPQ >>> HTTP response code: %s.', process_tag, response.status_code)
 
         if response.status_code == HTTP_OK:
             if scan_mode == 'full' or scan_mode == 'builds':
                 logger.info(f'{process_tag}PQ >>> Product query for id {product_id} has returned a valid response...')
 
-            db_cursor = db_connection.execute('SELECT COUNT(*) FROM gog_products WHERE gp_id = ?', (product_id,))
-            entry_count = db_cursor.fetchone()[0]
+            json_hash = hashlib.sha256(response.content).hexdigest()
+            # the (potentially large) existing payload will only be retrieved if the response hash differs;
+            # sqlite would otherwise always pick the unique gp_id index, which isn't a covering one
+            db_cursor = db_connection.execute(SELECT_ID_ENTRY_QUERY, (product_id,))
+            existing_entry = db_cursor.fetchone()
+
+            if existing_entry is None:
+                entry_count = 0
+                existing_json_hash = None
+            else:
+                entry_count = 1
+                existing_delisted, existing_json_hash, existing_title = existing_entry
 
             # no need to do any processing if an entry is found in 'full' or 'builds' scan modes,
-            # since that entry will be skipped anyway
-            if not (entry_count == 1 and (scan_mode == 'full' or scan_mode == 'builds')):
+            # since that entry will be skipped anyway, or if the response hash is unchanged
+            if not (entry_count == 1 and (scan_mode == 'full' or scan_mode == 'builds' or existing_json_hash == json_hash)):
                 # ignore unicode control characters which can be part of game descriptions and/or changelogs;
                 # these chars do absolutely nothing relevant but can mess with SQL imports/export and sometimes
                 # even with unicode conversions from and to the db... why do you do this, GOG, why???
-                filtered_response = JSON_UNICODE_REMOVAL_REGEX.sub('', response.text)
+                filtered_response = JSON_UNICODE_REMOVAL_REGEX.sub('', response.content.decode('utf-8'))
 
-                json_parsed = json.loads(filtered_response, object_pairs_hook=OrderedDict)
+                json_parsed = json_loads(filtered_response)
                 json_formatted = json.dumps(json_parsed, sort_keys=True, indent=4, separators=(',', ': '), ensure_ascii=False)
 
-                # process unmodified fields
-                #product_id = json_parsed['id']
-                product_title = json_parsed['title'].strip()
-                # process languages
-                if len(json_parsed['languages']) > 0:
-                    languages = MVF_VALUE_SEPARATOR.join([''.join((language_key, ': ', json_parsed['languages'][language_key]))
-                                                          for language_key in json_parsed['languages'].keys()])
+                if entry_count == 1:
+                    db_cursor.execute(SELECT_ID_PAYLOAD_QUERY, (product_id,))
+                    existing_json_formatted = db_cursor.fetchone()[0]
                 else:
-                    languages = None
-                # process changelog
-                try:
+                    existing_json_formatted = None
+
+                # only process the stored fields (and run the costly html conversions)
+                # for new entries or if the payload has actually changed
+                if existing_json_formatted != json_formatted:
+                    # process unmodified fields
+                    #product_id = json_parsed['id']
+                    product_title = json_parsed['title'].strip()
+                    # process languages
+                    languages = MVF_VALUE_SEPARATOR.join(''.join((language_key, ': ', language_value))
+                                                         for language_key, language_value in json_parsed['languages'].items()) or None
+                    # process changelog
                     changelog = parse_html_data(json_parsed['changelog'])
-                except AttributeError:
-                    changelog = None
 
-                if can_query_v2:
-                    product_title = None
-                    product_type = None
-                    gog_release_date = None
-                    links_store = None
-                    links_support = None
-                    links_forum = None
-                    description = None
-                # change the value of gp_v2_product_type to 'MOVIES' in order to better differentiate them
-                # (it's set to 'GAME' for all movie ids by default, although that makes little sense)
-                else:
-                    # the value stored here is the lowercase variant of productType in the v2 API payload
-                    product_type = 'MOVIE' if product_id in MOVIES_ID_LIST else json_parsed['game_type'].upper()
-                    # the value stored here is identical to gogReleaseDate in the v2 API payload
-                    gog_release_date = json_parsed['release_date']
-                    # the value stored here is identical to store in the v2 API payload
-                    links_store = json_parsed['links']['product_card']
-                    # the value stored here is identical to support in the v2 API payload
-                    links_support = json_parsed['links']['support']
-                    # the value stored here is identical to forum in the v2 API payload
-                    links_forum = json_parsed['links']['forum']
-                    # the value stored here is mostly identical to Description in the v2 API payload
-                    try:
-                        description = parse_html_data(json_parsed['description']['full'])
-                    except AttributeError:
+                    if can_query_v2:
+                        product_title = None
+                        product_type = None
+                        gog_release_date = None
+                        links_store = None
+                        links_support = None
+                        links_forum = None
                         description = None
+                    # change the value of gp_v2_product_type to 'MOVIES' in order to better differentiate them
+                    # (it's set to 'GAME' for all movie ids by default, although that makes little sense)
+                    else:
+                        # the value stored here is the lowercase variant of productType in the v2 API payload
+                        product_type = 'MOVIE' if product_id in MOVIES_ID_LIST else json_parsed['game_type'].upper()
+                        # the value stored here is identical to gogReleaseDate in the v2 API payload
+                        gog_release_date = json_parsed['release_date']
+                        # the value stored here is identical to store in the v2 API payload
+                        links_store = json_parsed['links']['product_card']
+                        # the value stored here is identical to support in the v2 API payload
+                        links_support = json_parsed['links']['support']
+                        # the value stored here is identical to forum in the v2 API payload
+                        links_forum = json_parsed['links']['forum']
+                        # the value stored here is mostly identical to Description in the v2 API payload
+                        description = parse_html_data(json_parsed['description']['full'])
 
             if entry_count == 0:
                 with db_lock:
@@ -381,7 +539,7 @@ def gog_product_extended_query(process_tag, product_id, scan_mode, db_lock, sess
                     # gp_v2_supported_os_versions, gp_v2_global_release_date, gp_v2_gog_release_date,
                     # gp_v2_tags, gp_v2_properties, gp_v2_series, gp_v2_features, gp_v2_is_using_dosbox,
                     # gp_v2_links_store, gp_v2_links_support, gp_v2_links_forum,
-                    # gp_v2_description, gp_languages, gp_changelog
+                    # gp_v2_description, gp_languages, gp_changelog, gp_int_json_hash, gp_int_v2_json_hash
                     db_cursor.execute(INSERT_ID_QUERY, (None, datetime.now().isoformat(' '), None, None,
                                                         json_formatted, None, None, None,
                                                         None, product_id, product_title, product_type, None, None,
@@ -390,7 +548,7 @@ def gog_product_extended_query(process_tag, product_id, scan_mode, db_lock, sess
                                                         None, None, gog_release_date,
                                                         None, None, None, None, False,
                                                         links_store, links_support, links_forum,
-                                                        description, languages, changelog))
+                                                        description, languages, changelog, json_hash, None))
                     db_connection.commit()
                 logger.info(f'{process_tag}PQ +++ Added a new DB entry for {product_id}: {product_title}.')
 
@@ -403,59 +561,71 @@ def gog_product_extended_query(process_tag, product_id, scan_mode, db_lock, sess
                     logger.info(f'{process_tag}PQ >>> Found an existing db entry with id {product_id}. Skipping.')
                 # manual scans will be treated as update scans
                 else:
-                    db_cursor.execute('SELECT gp_int_delisted, gp_int_json_payload, gp_v2_title FROM gog_products WHERE gp_id = ?', (product_id,))
-                    existing_delisted, existing_json_formatted, product_title = db_cursor.fetchone()
+                    product_title = existing_title
 
                     # clear the delisted status if an id is relisted (should only happen rarely)
                     if existing_delisted is not None:
-                        logger.debug(f'{process_tag}PQ >>> Found a previously delisted entry with id {product_id}. Removing delisted status...')
+                        logger.debug('%sPQ >>> Found a previously delisted entry with id %s. Removing delisted status...', process_tag, product_id)
                         with db_lock:
-                            db_cursor.execute('UPDATE gog_products SET gp_int_delisted = NULL WHERE gp_id = ?', (product_id,))
+                            db_cursor.execute(UPDATE_ID_RELISTED_QUERY, (product_id,))
                             db_connection.commit()
                         logger.info(f'{process_tag}PQ *** Removed delisted status for {product_id}: {product_title}.')
 
-                    if existing_json_formatted != json_formatted:
-                        logger.debug(f'{process_tag}PQ >>> Existing entry for {product_id} is outdated. Updating...')
+                    if existing_json_hash == json_hash:
+                        logger.debug('%sPQ >>> Unchanged response hash for %s. Skipping.', process_tag, product_id)
+
+                    elif existing_json_formatted != json_formatted:
+                        logger.debug('%sPQ >>> Existing entry for %s is outdated. Updating...', process_tag, product_id)
 
                         # calculate the diff between the new json and the previous one
                         # (applying the diff on the new json will revert to the previous version)
-                        if existing_json_formatted is not None:
-                            diff_formatted = ''.join([line for line in difflib.unified_diff(json_formatted.splitlines(1),
-                                                                                            existing_json_formatted.splitlines(1), n=0)])
-                        else:
+                        if existing_json_formatted is None:
+                            diff_formatted = None
+                        # difflib can take ages to process very large payloads, so skip the diff in that case
+                        elif len(existing_json_formatted) + len(json_formatted) > DIFF_SIZE_LIMIT:
+                            logger.warning(f'{process_tag}PQ >>> The data for {product_id} is too large to diff. Skipping diff.')
                             diff_formatted = None
+                        else:
+                            diff_formatted = ''.join(difflib.unified_diff(json_formatted.splitlines(keepends=True),
+                                                                          existing_json_formatted.splitlines(keepends=True), n=0))
 
                         with db_lock:
                             # gp_int_updated, gp_int_json_payload, gp_int_json_diff,
-                            # gp_languages, gp_changelog, gp_id (WHERE clause)
+                            # gp_languages, gp_changelog, gp_int_json_hash, gp_id (WHERE clause)
                             db_cursor.execute(UPDATE_ID_QUERY, (datetime.now().isoformat(' '), json_formatted, diff_formatted,
-                                                                languages, changelog, product_id))
+                                                                languages, changelog, json_hash, product_id))
                             db_connection.commit()
                         logger.info(f'{process_tag}PQ ~~~ Updated the DB entry for {product_id}: {product_title}.')
 
+                    # the response differs only in ways which are not reflected in the stored payload
+                    # (or no hash has been stored yet), so only store the new hash
+                    else:
+                        with db_lock:
+                            db_cursor.execute(UPDATE_ID_HASH_QUERY, (json_hash, product_id))
+                            db_connection.commit()
+
                     if can_query_v2:
                         gog_product_v2_query(process_tag, product_id, db_lock, session, db_connection)
 
         # existing ids return a 404 HTTP error code on removal
         elif scan_mode == 'update' and response.status_code == 404:
-            db_cursor = db_connection.execute('SELECT gp_int_delisted, gp_v2_title FROM gog_products WHERE gp_id = ?', (product_id,))
+            db_cursor = db_connection.execute(SELECT_ID_DELISTED_QUERY, (product_id,))
             existing_delisted, product_title = db_cursor.fetchone()
 
             # only alter the entry if not already marked as no longer listed
             if existing_delisted is None:
-                logger.debug(f'{process_tag}PQ >>> Product with id {product_id} has been delisted...')
+                logger.debug('%sPQ >>> Product with id %s has been delisted...', process_tag, product_id)
                 with db_lock:
                     # also clear diff fields when marking a product as delisted
-                    db_cursor.execute('UPDATE gog_products SET gp_int_delisted = ?, gp_int_json_diff = NULL, gp_int_v2_json_diff = NULL '
-                                      'WHERE gp_id = ?', (datetime.now().isoformat(' '), product_id))
+                    db_cursor.execute(UPDATE_ID_DELISTED_QUERY, (datetime.now().isoformat(' '), product_id))
                     db_connection.commit()
                 logger.warning(f'{process_tag}PQ --- Delisted the DB entry for: {product_id}: {product_title}.')
             else:
-                logger.debug(f'{process_tag}PQ >>> Product with id {product_id} is already marked as delisted.')
+                logger.debug('%sPQ >>> Product with id %s is already marked as delisted.', process_tag, product_id)
 
         # unmapped ids will also return a 404 HTTP error code
         elif response.status_code == 404:
-            logger.debug(f'{process_tag}PQ >>> Product with id {product_id} returned an HTTP 404 error code. Skipping.')
+            logger.debug('%sPQ >>> Product with id %s returned an HTTP 404 error code. Skipping.', process_tag, product_id)
 
         # at times ids may return a 500 HTTP error code (apparently caused by changelog corruption)
         elif response.status_code == 500:
@@ -484,16 +654,37 @@ def gog_product_extended_query(process_tag, product_id, scan_mode, db_lock, sess
         return (False, None)
 
     except:
-        logger.debug(f'{process_tag}PQ >>> Product extended query has failed for {product_id}.')
+        logger.debug('%sPQ >>> Product extended query has failed for %s.', process_tag, product_id)
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
         return (False, None)
 
-def gog_product_games_catalog_query(parameters, scan_mode, db_lock, session, db_connection):
+def gog_product_listing_check(product_id, session):
+
+    # no expand options are needed, since only the HTTP status code is of any interest
+    product_url = f'https://api.gog.com/products/{product_id}'
+
+    logger.debug('LQ >>> Checking url: %s.', product_url)
+
+    try:
+        response = session.head(product_url, timeout=HTTP_TIMEOUT)
+
+        logger.debug('LQ >>> HTTP response code: %s.', response.status_code)
+
+        return response.status_code
+
+    # any errors here are inconclusive, so leave them to the full product query
+    except:
+        logger.debug('LQ >>> Listing check has failed for %s.', product_id)
+        # uncomment for debugging purposes only
+        #logger.error(traceback.format_exc())
+        return None
+
+def gog_product_games_catalog_query(parameters, session):
 
     catalog_url = f'https://catalog.gog.com/v1/catalog?{parameters}'
 
-    logger.debug(f'GQ >>> Querying url: {catalog_url}.')
+    logger.debug('GQ >>> Querying url: %s.', catalog_url)
 
     # return a value of 0, should something go terribly wrong
     pages = 0
@@ -501,341 +692,319 @@ def gog_product_games_catalog_query(parameters, scan_mode, db_lock, session, db_
     try:
         response = session.get(catalog_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'GQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('GQ >>> HTTP response code: %s.', response.status_code)
 
         if response.status_code == HTTP_OK:
-            gogData_json = json.loads(response.text, object_pairs_hook=OrderedDict)
+            gogData_json = json_loads(response.content)
 
             # return the number of pages, as listed in the response
             pages = gogData_json['pages']
-            logger.debug(f'GQ >>> Response pages: {pages}.')
-
-            # use a set to avoid processing potentially duplicate ids
-            id_set = set()
-
-            for product_element in gogData_json['products']:
-                id_value = product_element['id']
-                logger.debug(f'GQ >>> Found the following id: {id_value}.')
-                id_set.add(id_value)
+            logger.debug('GQ >>> Response pages: %s.', pages)
 
-            # sort the set into an ordered list
-            id_list = sorted(id_set)
-
-            for product_id in id_list:
-                if product_id not in SKIP_IDS:
-                    logger.debug(f'GQ >>> Running scan for id {product_id}...')
-                    retries_complete = False
-                    retry_counter = 0
-    
-                    while not retries_complete:
-                        if retry_counter > 0:
-                            logger.warning(f'GQ >>> Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                            sleep(RETRY_SLEEP_INTERVAL)
-                            logger.warning(f'GQ >>> Reprocessing id {product_id}...')
-    
-                        retries_complete, http_status = gog_product_extended_query('', product_id, scan_mode, db_lock,
-                                                                                   session, db_connection)
-    
-                        if not retries_complete:
-                            retry_counter += 1
-                            # terminate the scan if the RETRY_COUNT limit is exceeded
-                            if retry_counter > RETRY_COUNT:
-                                # skip the id if the server returns HTTP 500
-                                if http_status == 500:
-                                    logger.warning(f'GQ >>> Skipping id {product_id} due to an HTTP 500 error code.')
-                                    retries_complete = True
-                                else:
-                                    logger.critical('GQ >>> Retry count exceeded, terminating scan!')
-                                    raise Exception()
-                else:
-                    logger.warning(f'GQ >>> Skipping the following id: {product_id}.')
+            # drop any potentially duplicate ids, while keeping the listing order
+            id_list = list(dict.fromkeys(product_element['id'] for product_element in gogData_json['products']))
+            logger.debug('GQ >>> Found the following ids: %s.', id_list)
 
         else:
             logger.warning(f'GQ >>> HTTP error code {response.status_code} received.')
             raise Exception()
 
-        return (True, pages)
+        return (True, pages, id_list)
 
     # sometimes the connection may time out
     except requests.Timeout:
-        logger.warning(f'GQ >>> HTTP request timed out after {HTTP_TIMEOUT} seconds for {product_id}.')
-        return (False, 0)
+        logger.warning(f'GQ >>> HTTP request timed out after {HTTP_TIMEOUT} seconds.')
+        return (False, 0, None)
 
     # sometimes the HTTPS connection encounters SSL errors
     except requests.exceptions.SSLError:
-        logger.warning(f'GQ >>> Connection SSL error encountered for {product_id}.')
-        return (False, 0)
+        logger.warning('GQ >>> Connection SSL error encountered.')
+        return (False, 0, None)
 
     # sometimes the HTTPS connection gets rejected/terminated
     except requests.exceptions.ConnectionError:
-        logger.warning(f'GQ >>> Connection error encountered for {product_id}.')
-        return (False, 0)
+        logger.warning('GQ >>> Connection error encountered.')
+        return (False, 0, None)
 
     except:
         logger.debug('GQ >>> Processing has failed!')
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
-        return (False, 0)
+        return (False, 0, None)
 
-def gog_files_extract_parser(db_connection, product_id):
+def gog_product_games_catalog_page_scan(catalog_name, catalog_parameters, page_no, session, fail_event, terminate_event):
+    # returns the page count reported by the API along with the listed ids, or (0, None) if the scan is terminated
+    retries_complete = False
+    retry_counter = 0
 
-    db_cursor = db_connection.execute('SELECT gp_int_json_payload FROM gog_products WHERE gp_id = ?', (product_id,))
-    json_payload = db_cursor.fetchone()[0]
-
-    json_parsed = json.loads(json_payload, object_pairs_hook=OrderedDict)
-
-    # extract installer entries
-    json_parsed_installers = json_parsed['downloads']['installers']
-    # extract patch entries
-    json_parsed_patches = json_parsed['downloads']['patches']
-    # extract language_packs entries
-    json_parsed_language_packs = json_parsed['downloads']['language_packs']
-    # extract bonus_content entries
-    json_parsed_bonus_content = json_parsed['downloads']['bonus_content']
-
-    # process installer entries
-    db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? '
-                      'AND gf_int_download_type = \'installer\' AND gf_int_removed IS NULL', (product_id,))
-    listed_installer_pks = [pk_result[0] for pk_result in db_cursor.fetchall()]
-
-    for installer_entry in json_parsed_installers:
-        installer_id = installer_entry['id']
-        installer_product_name = installer_entry['name'].strip()
-        installer_os = installer_entry['os']
-        installer_language = installer_entry['language']
-        try:
-            installer_version = installer_entry['version'].strip()
-        except AttributeError:
-            installer_version = None
-        installer_total_size = installer_entry['total_size']
+    while not retries_complete and not terminate_event.is_set():
+        if retry_counter > 0:
+            sleep_interval = retry_sleep_interval(retry_counter)
+            logger.warning(f'Retry number {retry_counter}. Sleeping for {sleep_interval:.1f}s...')
+            sleep(sleep_interval)
+            logger.warning(f'Reprocessing {catalog_name} page {page_no}...')
 
-        for installer_file in installer_entry['files']:
-            installer_file_id = installer_file['id']
-            installer_file_size = installer_file['size']
+        catalog_page_parameters = ''.join((catalog_parameters, '&page=', str(page_no), CATALOG_LOCALE_PARAMETERS))
+        retries_complete, page_count, page_id_list = gog_product_games_catalog_query(catalog_page_parameters, session)
 
-            if installer_version is not None:
-                db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? AND gf_int_download_type = \'installer\' AND gf_id = ? '
-                                  'AND gf_os = ? AND gf_language = ? AND gf_version = ? AND gf_file_id = ? AND gf_file_size = ? AND gf_int_removed IS NULL',
-                                  (product_id, installer_id, installer_os, installer_language, installer_version, installer_file_id, installer_file_size))
-            else:
-                db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? AND gf_int_download_type = \'installer\' AND gf_id = ? '
-                                  'AND gf_os = ? AND gf_language = ? AND gf_version IS NULL AND gf_file_id = ? AND gf_file_size = ? AND gf_int_removed IS NULL',
-                                  (product_id, installer_id, installer_os, installer_language, installer_file_id, installer_file_size))
-
-            entry_pk = db_cursor.fetchone()
-
-            if entry_pk is None:
-                # gf_int_nr, gf_int_added, gf_int_removed, gf_int_id, gf_int_download_type,
-                # gf_id, gf_name, gf_os, gf_language, gf_version,
-                # gf_type, gf_count, gf_total_size, gf_file_id, gf_file_size
-                db_cursor.execute(INSERT_FILES_QUERY, (None, datetime.now().isoformat(' '), None, product_id, 'installer',
-                                                       installer_id, installer_product_name, installer_os, installer_language, installer_version,
-                                                       None, None, installer_total_size, installer_file_id, installer_file_size))
-                # no need to print the os here, as it's included in the installer_id
-                logger.info(f'FQ +++ Added DB entry for {product_id}: {installer_product_name}, {installer_id}, {installer_version}.')
+        if retries_complete:
+            if retry_counter > 0:
+                logger.info(f'Succesfully retried for {catalog_name} page {page_no}.')
+
+            return (page_count, page_id_list)
+
+        else:
+            retry_counter += 1
+            # terminate the scan if the RETRY_COUNT limit is exceeded
+            if retry_counter > RETRY_COUNT:
+                logger.critical('Retry count exceeded, terminating scan!')
+                fail_event.set()
+                terminate_event.set()
 
+    return (0, None)
+
+def gog_product_games_catalog_scan(catalog_name, catalog_parameters, fail_event, terminate_event):
+    # runs in a separate thread, so only collect the listed ids here and leave all the
+    # product processing (and DB writes) to the main thread
+    catalog_id_set = set()
+
+    with gog_session() as session:
+        logger.info(f'Running scan for {catalog_name} entries...')
+        # the first page also reports the page count, which is needed before querying any other pages
+        page_count, page_id_list = gog_product_games_catalog_page_scan(catalog_name, catalog_parameters, 1,
+                                                                       session, fail_event, terminate_event)
+
+        if page_id_list is not None:
+            catalog_id_set.update(page_id_list)
+
+            # use default website pagination, which means the response can be split across 2+ pages in the API call
+            if page_count > 1:
+                with ThreadPoolExecutor(max_workers=CATALOG_PAGE_THREADS) as page_executor:
+                    page_futures = [page_executor.submit(gog_product_games_catalog_page_scan, catalog_name, catalog_parameters,
+                                                         page_no, session, fail_event, terminate_event)
+                                    for page_no in range(2, page_count + 1)]
+
+                    for page_future in page_futures:
+                        page_id_list = page_future.result()[1]
+                        if page_id_list is not None:
+                            catalog_id_set.update(page_id_list)
+
+    return catalog_id_set
+
+def gog_product_id_scan(product_id, scan_mode, db_lock, session, db_connection, fail_event, terminate_event):
+    # returns True once the id has been processed (or skipped), or False if the scan has been terminated
+    retries_complete = False
+    retry_counter = 0
+
+    while not retries_complete and not terminate_event.is_set():
+        if retry_counter > 0:
+            sleep_interval = retry_sleep_interval(retry_counter)
+            logger.warning(f'Retry number {retry_counter}. Sleeping for {sleep_interval:.1f}s...')
+            sleep(sleep_interval)
+            logger.warning(f'Reprocessing id {product_id}...')
+
+        retries_complete, http_status = gog_product_extended_query('', product_id, scan_mode, db_lock,
+                                                                   session, db_connection)
+
+        if retries_complete:
+            if retry_counter > 0:
+                logger.info(f'Succesfully retried for {product_id}.')
+        else:
+            retry_counter += 1
+            # terminate the scan if the RETRY_COUNT limit is exceeded
+            if retry_counter > RETRY_COUNT:
+                # skip the id if the server returns HTTP 500
+                if http_status == 500:
+                    logger.warning(f'Skipping id {product_id} due to an HTTP 500 error code.')
+                    retries_complete = True
+                else:
+                    logger.critical('Retry count exceeded, terminating scan!')
+                    fail_event.set()
+                    terminate_event.set()
+
+    return retries_complete
+
+def gog_product_ids_scan(id_list, scan_mode, db_lock, fail_event, terminate_event):
+    # runs in a separate thread, so it needs its own session and DB connection;
+    # all DB writes are guarded by db_lock, same as for the full scan processes
+    with gog_session() as session, gog_db_connect() as db_connection:
+        for product_id in id_list:
+            if terminate_event.is_set():
+                break
+
+            if product_id not in SKIP_IDS:
+                logger.debug('Running scan for id %s...', product_id)
+                gog_product_id_scan(product_id, scan_mode, db_lock, session, db_connection, fail_event, terminate_event)
             else:
-                logger.debug(f'FQ >>> Found an existing entry for {product_id}: {installer_product_name}, {installer_id}, {installer_version}.')
-                listed_installer_pks.remove(entry_pk[0])
-
-    if len(listed_installer_pks) > 0:
-        for removed_pk in listed_installer_pks:
-            db_cursor.execute('UPDATE gog_files SET gf_int_removed = ? WHERE gf_int_nr = ? AND gf_int_removed IS NULL',
-                              (datetime.now().isoformat(' '), removed_pk))
-
-        logger.info(f'FQ --- Marked some installer entries as removed for {product_id}')
-
-    # process patch entries
-    db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? '
-                      'AND gf_int_download_type = \'patch\' AND gf_int_removed IS NULL', (product_id,))
-    listed_patch_pks = [pk_result[0] for pk_result in db_cursor.fetchall()]
-
-    for patch_entry in json_parsed_patches:
-        patch_id = patch_entry['id']
-        patch_product_name = patch_entry['name'].strip()
-        patch_os = patch_entry['os']
-        patch_language = patch_entry['language']
+                logger.warning(f'Skipping the following id: {product_id}.')
+
+def gog_product_ids_threaded_scan(id_list, scan_mode, db_lock, fail_event, terminate_event):
+    # the per-id product queries are I/O bound, so spread the ids across several threads
+    with ThreadPoolExecutor(max_workers=ID_SCAN_THREADS) as scan_executor:
         try:
-            patch_version = patch_entry['version'].strip()
-        except AttributeError:
-            patch_version = None
-        # replace blank patch version with None (blanks happens with patches, but not with installers)
-        if patch_version == '': 
-            patch_version = None
-        patch_total_size = patch_entry['total_size']
-
-        for patch_file in patch_entry['files']:
-            patch_file_id = patch_file['id']
-            patch_file_size = patch_file['size']
-
-            if patch_version is not None:
-                db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? AND gf_int_download_type = \'patch\' AND gf_id = ? '
-                                  'AND gf_os = ? AND gf_language = ? AND gf_version = ? AND gf_file_id = ? AND gf_file_size = ? AND gf_int_removed IS NULL',
-                                  (product_id, patch_id, patch_os, patch_language, patch_version, patch_file_id, patch_file_size))
-            else:
-                db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? AND gf_int_download_type = \'patch\' AND gf_id = ? '
-                                  'AND gf_os = ? AND gf_language = ? AND gf_version IS NULL AND gf_file_id = ? AND gf_file_size = ? AND gf_int_removed IS NULL',
-                                  (product_id, patch_id, patch_os, patch_language, patch_file_id, patch_file_size))
-
-            entry_pk = db_cursor.fetchone()
-
-            if entry_pk is None:
-                # gf_int_nr, gf_int_added, gf_int_removed, gf_int_id, gf_int_download_type,
-                # gf_id, gf_name, gf_os, gf_language, gf_version,
-                # gf_type, gf_count, gf_total_size, gf_file_id, gf_file_size
-                db_cursor.execute(INSERT_FILES_QUERY, (None, datetime.now().isoformat(' '), None, product_id, 'patch',
-                                                       patch_id, patch_product_name, patch_os, patch_language, patch_version,
-                                                       None, None, patch_total_size, patch_file_id, patch_file_size))
-                # no need to print the os here, as it's included in the patch_id
-                logger.info(f'FQ +++ Added DB entry for {product_id}: {patch_product_name}, {patch_id}, {patch_version}.')
+            scan_futures = [scan_executor.submit(gog_product_ids_scan, id_list[thread_no::ID_SCAN_THREADS], scan_mode,
+                                                 db_lock, fail_event, terminate_event) for thread_no in range(ID_SCAN_THREADS)]
+            for scan_future in scan_futures:
+                scan_future.result()
+        # let the scan threads know they need to stop before waiting on them
+        except SystemExit:
+            terminate_event.set()
+            raise
 
-            else:
-                logger.debug(f'FQ >>> Found an existing entry for {product_id}: {patch_product_name}, {patch_id}, {patch_version}.')
-                listed_patch_pks.remove(entry_pk[0])
-
-    if len(listed_patch_pks) > 0:
-        for removed_pk in listed_patch_pks:
-            db_cursor.execute('UPDATE gog_files SET gf_int_removed = ? WHERE gf_int_nr = ? AND gf_int_removed IS NULL',
-                              (datetime.now().isoformat(' '), removed_pk))
-
-        logger.info(f'FQ --- Marked some patch entries as removed for {product_id}')
-
-    # process language_packs entries
-    db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? '
-                      'AND gf_int_download_type = \'language_packs\' AND gf_int_removed IS NULL', (product_id,))
-    listed_language_packs_pks = [pk_result[0] for pk_result in db_cursor.fetchall()]
-
-    for language_pack_entry in json_parsed_language_packs:
-        language_pack_id = language_pack_entry['id']
-        language_pack_product_name = language_pack_entry['name'].strip()
-        language_pack_os = language_pack_entry['os']
-        language_pack_language = language_pack_entry['language']
+def gog_files_entry_key(*entry_values):
+    # compare all values as text, since column affinity can store ids either as integers or strings
+    return tuple(None if entry_value is None else str(entry_value) for entry_value in entry_values)
+
+def gog_files_entry_values(download_type, download_entry):
+    entry_id = download_entry['id']
+    entry_product_name = download_entry['name'].strip()
+    entry_total_size = download_entry['total_size']
+
+    if download_type == 'bonus_content':
+        # bonus content type 'guides & reference ' has a trailing space
+        entry_type = download_entry['type'].strip()
+        entry_count = download_entry['count']
+        # bonus_content entries are not versioned, but their type is worth printing instead
+        entry_details = entry_type
+        entry_key_prefix = gog_files_entry_key(entry_id, entry_type, entry_count)
+        # gf_id, gf_name, gf_os, gf_language, gf_version, gf_type, gf_count, gf_total_size
+        entry_values = (entry_id, entry_product_name, None, None, None, entry_type, entry_count, entry_total_size)
+
+    else:
+        entry_os = download_entry['os']
+        entry_language = download_entry['language']
         try:
-            language_pack_version = language_pack_entry['version'].strip()
+            entry_version = download_entry['version'].strip()
         except AttributeError:
-            language_pack_version = None
-        language_pack_total_size = language_pack_entry['total_size']
-
-        for language_pack_file in language_pack_entry['files']:
-            language_pack_file_id = language_pack_file['id']
-            language_pack_file_size = language_pack_file['size']
-
-            if language_pack_version is not None:
-                db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? AND gf_int_download_type = \'language_packs\' AND gf_id = ? '
-                                  'AND gf_os = ? AND gf_language = ? AND gf_version = ? AND gf_file_id = ? AND gf_file_size = ? AND gf_int_removed IS NULL',
-                                  (product_id, language_pack_id, language_pack_os, language_pack_language, language_pack_version,
-                                   language_pack_file_id, language_pack_file_size))
-            else:
-                db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? AND gf_int_download_type = \'language_packs\' AND gf_id = ? '
-                                  'AND gf_os = ? AND gf_language = ? AND gf_version IS NULL AND gf_file_id = ? AND gf_file_size = ? AND gf_int_removed IS NULL',
-                                  (product_id, language_pack_id, language_pack_os, language_pack_language,
-                                   language_pack_file_id, language_pack_file_size))
-
-            entry_pk = db_cursor.fetchone()
-
-            if entry_pk is None:
-                # gf_int_nr, gf_int_added, gf_int_removed, gf_int_id, gf_int_download_type, gf_id,
-                # gf_name, gf_os, gf_language, gf_version,
-                # gf_type, gf_count, gf_total_size, gf_file_id, gf_file_size
-                db_cursor.execute(INSERT_FILES_QUERY, (None, datetime.now().isoformat(' '), None, product_id, 'language_packs', language_pack_id,
-                                                       language_pack_product_name, language_pack_os, language_pack_language, language_pack_version,
-                                                       None, None, language_pack_total_size, language_pack_file_id, language_pack_file_size))
-                # no need to print the os here, as it's included in the patch_id
-                logger.info(f'FQ +++ Added DB entry for {product_id}: {language_pack_product_name}, {language_pack_id}, {language_pack_version}.')
+            entry_version = None
+        # replace blank patch version with None (blanks happens with patches, but not with installers)
+        if download_type == 'patch' and entry_version == '':
+            entry_version = None
+        # no need to print the os here, as it's included in the entry id
+        entry_details = entry_version
+        entry_key_prefix = gog_files_entry_key(entry_id, entry_os, entry_language, entry_version)
+        # gf_id, gf_name, gf_os, gf_language, gf_version, gf_type, gf_count, gf_total_size
+        entry_values = (entry_id, entry_product_name, entry_os, entry_language, entry_version, None, None, entry_total_size)
 
-            else:
-                logger.debug(f'FQ >>> Found an existing entry for {product_id}: {language_pack_product_name}, {language_pack_id}, {language_pack_version}.')
-                listed_language_packs_pks.remove(entry_pk[0])
+    # the entry values are shared by all the files of an entry, so only convert the key values once
+    return (entry_values, entry_key_prefix, entry_details)
 
-    if len(listed_language_packs_pks) > 0:
-        for removed_pk in listed_language_packs_pks:
-            db_cursor.execute('UPDATE gog_files SET gf_int_removed = ? WHERE gf_int_nr = ? AND gf_int_removed IS NULL',
-                              (datetime.now().isoformat(' '), removed_pk))
+def gog_files_extract_parser(db_connection, product_id):
 
-        logger.info(f'FQ --- Marked some language_pack entries as removed for {product_id}')
+    # take the write lock upfront, so that all the file entries of a product are processed in a single transaction
+    db_connection.execute('BEGIN IMMEDIATE')
 
-    # process bonus_content entries
-    db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? '
-                      'AND gf_int_download_type = \'bonus_content\' AND gf_int_removed IS NULL', (product_id,))
-    listed_bonus_content_pks = [pk_result[0] for pk_result in db_cursor.fetchall()]
+    try:
+        # use the same timestamp for all the added/removed entries of a product
+        current_timestamp = datetime.now().isoformat(' ')
 
-    for bonus_content_entry in json_parsed_bonus_content:
-        bonus_content_id = bonus_content_entry['id']
-        bonus_content_product_name = bonus_content_entry['name'].strip()
-        # bonus content type 'guides & reference ' has a trailing space
-        bonus_content_type = bonus_content_entry['type'].strip()
-        bonus_content_count = bonus_content_entry['count']
-        bonus_content_total_size = bonus_content_entry['total_size']
-
-        for bonus_content_file in bonus_content_entry['files']:
-            bonus_content_file_id = bonus_content_file['id']
-            bonus_content_file_size = bonus_content_file['size']
-
-            db_cursor.execute('SELECT gf_int_nr FROM gog_files WHERE gf_int_id = ? AND gf_int_download_type = \'bonus_content\' AND gf_id = ? '
-                              'AND gf_type = ? AND gf_count = ? AND gf_file_id = ? AND gf_file_size = ? AND gf_int_removed IS NULL',
-                              (product_id, bonus_content_id, bonus_content_type, bonus_content_count, bonus_content_file_id, bonus_content_file_size))
-
-            entry_pk = db_cursor.fetchone()
-
-            if entry_pk is None:
-                # gf_int_nr, gf_int_added, gf_int_removed, gf_int_id, gf_int_download_type,
-                # gf_id, gf_name, gf_os, gf_language, gf_version,
-                # gf_type, gf_count, gf_total_size, gf_file_id, gf_file_size
-                db_cursor.execute(INSERT_FILES_QUERY, (None, datetime.now().isoformat(' '), None, product_id, 'bonus_content',
-                                                       bonus_content_id, bonus_content_product_name, None, None, None,
-                                                       bonus_content_type, bonus_content_count, bonus_content_total_size,
-                                                       bonus_content_file_id, bonus_content_file_size))
-                # print the entry type, since bonus_content entries are not versioned
-                logger.info(f'FQ +++ Added DB entry for {product_id}: {bonus_content_product_name}, {bonus_content_id}, {bonus_content_type}.')
+        # only the downloads section is needed here, so have SQLite extract it rather than parsing the whole payload
+        db_cursor = db_connection.execute(SELECT_DOWNLOADS_QUERY, (product_id,))
+        json_payload = db_cursor.fetchone()[0]
 
+        json_parsed = json_loads(json_payload)
+
+        added_rows = []
+
+        for download_type, downloads_key in FILES_DOWNLOAD_TYPES:
+            if download_type == 'bonus_content':
+                db_cursor.execute(SELECT_BONUS_CONTENT_FILES_QUERY, (product_id,))
             else:
-                logger.debug(f'FQ >>> Found an existing entry for {product_id}: {bonus_content_product_name}, {bonus_content_id}, {bonus_content_type}.')
-                listed_bonus_content_pks.remove(entry_pk[0])
+                db_cursor.execute(SELECT_FILES_QUERY, (product_id, download_type))
+
+            # existing entries are mapped by their comparable values, with the lowest pk being kept for
+            # any duplicate entries - the other duplicates can never be matched, so they get removed
+            listed_pks = {}
+            removed_pks = []
+            for pk_result in db_cursor.fetchall():
+                listed_key = gog_files_entry_key(*pk_result[1:])
+                if listed_key not in listed_pks:
+                    listed_pks[listed_key] = pk_result[0]
+                else:
+                    removed_pks.append(pk_result[0])
 
-    if len(listed_bonus_content_pks) > 0:
-        for removed_pk in listed_bonus_content_pks:
-            db_cursor.execute('UPDATE gog_files SET gf_int_removed = ? WHERE gf_int_nr = ? AND gf_int_removed IS NULL',
-                              (datetime.now().isoformat(' '), removed_pk))
+            for download_entry in json_parsed[downloads_key]:
+                entry_values, entry_key_prefix, entry_details = gog_files_entry_values(download_type, download_entry)
+                entry_id, entry_product_name = entry_values[:2]
 
-        logger.info(f'FQ --- Marked some bonus_content entries as removed for {product_id}')
+                for entry_file in download_entry['files']:
+                    entry_file_id = entry_file['id']
+                    entry_file_size = entry_file['size']
 
-    db_connection.commit()
+                    entry_key = entry_key_prefix + gog_files_entry_key(entry_file_id, entry_file_size)
+
+                    if entry_key not in listed_pks:
+                        # gf_int_nr, gf_int_added, gf_int_removed, gf_int_id, gf_int_download_type,
+                        # gf_id, gf_name, gf_os, gf_language, gf_version,
+                        # gf_type, gf_count, gf_total_size, gf_file_id, gf_file_size
+                        added_rows.append((None, current_timestamp, None, product_id, download_type,
+                                           *entry_values, entry_file_id, entry_file_size))
+                        logger.info(f'FQ +++ Added DB entry for {product_id}: {entry_product_name}, {entry_id}, {entry_details}.')
+
+                    else:
+                        logger.debug('FQ >>> Found an existing entry for %s: %s, %s, %s.', product_id, entry_product_name, entry_id, entry_details)
+
+                    # entries which are still listed (or have just been added) are marked with a None pk
+                    listed_pks[entry_key] = None
+
+            removed_pks.extend(entry_pk for entry_pk in listed_pks.values() if entry_pk is not None)
+
+            if len(removed_pks) > 0:
+                db_cursor.executemany(UPDATE_FILES_REMOVED_QUERY, [(current_timestamp, removed_pk) for removed_pk in removed_pks])
+
+                logger.info(f'FQ --- Marked some {download_type} entries as removed for {product_id}')
+
+        if len(added_rows) > 0:
+            db_cursor.executemany(INSERT_FILES_QUERY, added_rows)
+
+        db_connection.commit()
+
+    except:
+        db_connection.rollback()
+        raise
 
-def gog_products_bulk_query(process_tag, product_id, scan_mode, db_lock, session, db_connection):
+def gog_products_bulk_query(process_tag, product_id, scan_mode, existing_ids, db_lock, session, db_connection):
     # generate a string of comma separated ids in the current batch
-    product_ids_string = ','.join([str(product_id_value) for product_id_value in
-                                   range(product_id, product_id + IDS_IN_BATCH) if product_id_value not in SKIP_IDS])
+    product_ids_string = ','.join(str(product_id_value) for product_id_value in
+                                  range(product_id, product_id + IDS_IN_BATCH) if product_id_value not in SKIP_IDS)
     
-    logger.debug(f'{process_tag}BQ >>> Processing the following product_id string batch: {product_ids_string}.')
+    logger.debug('%sBQ >>> Processing the following product_id string batch: %s.', process_tag, product_ids_string)
 
     bulk_products_url = f'https://api.gog.com/products?ids={product_ids_string}'
 
     try:
         response = session.get(bulk_products_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'{process_tag}BQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('%sBQ >>> HTTP response code: %s.', process_tag, response.status_code)
 
-        if response.status_code == HTTP_OK and response.text != '[]':
+        if response.status_code == HTTP_OK and response.content != b'[]':
             logger.info(f'{process_tag}BQ >>> Found something in the {product_id} <-> {product_id + IDS_IN_BATCH - 1} range...')
 
-            json_parsed = json.loads(response.text, object_pairs_hook=OrderedDict)
+            json_parsed = json_loads(response.content)
 
             for line in json_parsed:
                 current_product_id = line['id']
+
+                # existing entries are skipped in full scans anyway, so don't bother querying them again
+                if current_product_id in existing_ids:
+                    logger.info(f'{process_tag}BQ >>> Found an existing db entry with id {current_product_id}. Skipping.')
+                    continue
+
                 retries_complete = False
                 retry_counter = 0
 
                 while not retries_complete:
                     if retry_counter > 0:
-                        logger.warning(f'{process_tag}BQ >>> Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                        sleep(RETRY_SLEEP_INTERVAL)
+                        sleep_interval = retry_sleep_interval(retry_counter)
+                        logger.warning(f'{process_tag}BQ >>> Retry number {retry_counter}. Sleeping for {sleep_interval:.1f}s...')
+                        sleep(sleep_interval)
                         logger.warning(f'{process_tag}BQ >>> Reprocessing id {current_product_id}...')
 
                     retries_complete, http_status = gog_product_extended_query(process_tag, current_product_id, scan_mode, db_lock,
                                                                                session, db_connection)
 
                     if retries_complete:
-                        if retry_counter > 1:
+                        if retry_counter > 0:
                             logger.info(f'{process_tag}BQ >>> Succesfully retried for {current_product_id}.')
                     else:
                         # skip the id if the server returns HTTP 500
@@ -844,10 +1013,15 @@ def gog_products_bulk_query(process_tag, product_id, scan_mode, db_lock, session
                             retries_complete = True
                         else:
                             retry_counter += 1
+                            # fail the whole batch if the RETRY_COUNT limit is exceeded, so that the worker
+                            # process can retry it (and terminate the scan, should that fail as well)
+                            if retry_counter > RETRY_COUNT:
+                                logger.warning(f'{process_tag}BQ >>> Retry count exceeded for id {current_product_id}.')
+                                raise Exception()
 
         # this should not be handled as an exception, as it's the default behavior when nothing is detected
-        elif response.status_code == HTTP_OK and response.text == '[]':
-            logger.debug(f'{process_tag}BQ >>> A blank list entry ([]) received.')
+        elif response.status_code == HTTP_OK and response.content == b'[]':
+            logger.debug('%sBQ >>> A blank list entry ([]) received.', process_tag)
 
         else:
             logger.warning(f'{process_tag}BQ >>> HTTP error code {response.status_code} received for the {product_id} '
@@ -867,24 +1041,27 @@ def gog_products_bulk_query(process_tag, product_id, scan_mode, db_lock, session
         return False
 
     except:
-        logger.debug(f'{process_tag}BQ >>> Products bulk query has failed for the {product_id} <-> {product_id + IDS_IN_BATCH - 1} range.')
+        logger.debug('%sBQ >>> Products bulk query has failed for the %s <-> %s range.', process_tag, product_id, product_id + IDS_IN_BATCH - 1)
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
 
         return False
 
-def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
+def worker_process(process_tag, scan_mode, id_queue, db_lock,
                    fail_event, terminate_event):
     # catch SIGTERM and exit gracefully
     signal.signal(signal.SIGTERM, sigterm_handler)
     # catch SIGINT and exit gracefully
     signal.signal(signal.SIGINT, sigint_handler)
 
-    processConfigParser = ConfigParser()
-
-    with requests.Session() as processSession, sqlite3.connect(DB_FILE_PATH) as process_db_connection:
+    with gog_session() as processSession, gog_db_connect() as process_db_connection:
         logger.info(f'{process_tag}>>> Starting worker process...')
 
+        # ids added by other worker processes won't be included, but those will still get skipped after the product query
+        db_cursor = process_db_connection.execute('SELECT gp_id FROM gog_products')
+        existing_ids = frozenset(id_entry[0] for id_entry in db_cursor.fetchall())
+        logger.debug('%s>>> Retrieved %s existing product ids from the DB...', process_tag, len(existing_ids))
+
         try:
             while not terminate_event.is_set():
                 product_id = id_queue.get(True, QUEUE_WAIT_TIMEOUT)
@@ -894,12 +1071,12 @@ def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
 
                 while not retries_complete and not terminate_event.is_set():
                     if retry_counter > 0:
-                        logger.debug(f'{process_tag}>>> Retry count: {retry_counter}.')
+                        logger.debug('%s>>> Retry count: %s.', process_tag, retry_counter)
                         # main iteration incremental sleep
-                        sleep((INCREMENTAL_RETRY_BASE ** (retry_counter - 1)) * RETRY_SLEEP_INTERVAL)
+                        sleep(retry_sleep_interval(retry_counter))
 
-                        retries_complete = gog_products_bulk_query(process_tag, product_id, scan_mode, db_lock,
-                                                                   processSession, process_db_connection)
+                    retries_complete = gog_products_bulk_query(process_tag, product_id, scan_mode, existing_ids, db_lock,
+                                                               processSession, process_db_connection)
 
                     if retries_complete:
                         if retry_counter > 0:
@@ -912,28 +1089,20 @@ def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
                             fail_event.set()
                             terminate_event.set()
 
-                if product_id % ID_SAVE_INTERVAL == 0 and not terminate_event.is_set():
-                    with config_lock:
-                        processConfigParser.read(CONF_FILE_PATH)
-                        processConfigParser['FULL_SCAN']['start_id'] = str(product_id)
-
-                        with open(CONF_FILE_PATH, 'w') as file:
-                            processConfigParser.write(file)
-
-                        logger.info(f'{process_tag}>>> Processed up to id: {product_id}...')
-
         # the main process has stopped populating the queue if this exception is raised
         except queue.Empty:
-            logger.debug(f'{process_tag}>>> Timed out while waiting for queue.')
+            logger.debug('%s>>> Timed out while waiting for queue.', process_tag)
 
         except SystemExit:
             pass
 
         logger.info(f'{process_tag}>>> Stopping worker process...')
 
-        logger.debug(f'{process_tag}>>> Running PRAGMA optimize...')
-        with db_lock:
-            process_db_connection.execute(OPTIMIZE_QUERY)
+        # there's nothing for PRAGMA optimize to pick up if the process hasn't written anything
+        if process_db_connection.total_changes > 0:
+            logger.debug('%s>>> Running PRAGMA optimize...', process_tag)
+            with db_lock:
+                process_db_connection.execute(OPTIMIZE_QUERY)
 
 if __name__ == "__main__":
     # catch SIGTERM and exit gracefully
@@ -980,17 +1149,18 @@ if __name__ == "__main__":
 
         scan_mode = general_section.get('scan_mode')
         # ids that will be skipped, for one reason or another
-        SKIP_IDS = [int(product_id.strip()) for product_id in
-                    general_section.get('skip_ids').split(',') if product_id != '']
+        # ids which are skipped by all scans (checked for every scanned id)
+        SKIP_IDS = frozenset(int(product_id.strip()) for product_id in
+                             general_section.get('skip_ids').split(',') if product_id != '')
         CONF_BACKUP = general_section.get('conf_backup')
         DB_BACKUP = general_section.get('db_backup')
         HTTP_TIMEOUT = general_section.getint('http_timeout')
         RETRY_COUNT = general_section.getint('retry_count')
         RETRY_SLEEP_INTERVAL = general_section.getint('retry_sleep_interval')
         INCREMENTAL_RETRY_BASE = general_section.getint('incremental_retry_base')
-        # ids that don't have a valid v2 endpoint for some reason
-        NO_V2_ENDPOINT = [int(product_id.strip()) for product_id in
-                          general_section.get('no_v2_endpoint').split(',') if product_id != '']
+        # ids that don't have a valid v2 endpoint for some reason (checked for every product query)
+        NO_V2_ENDPOINT = frozenset(int(product_id.strip()) for product_id in
+                                   general_section.get('no_v2_endpoint').split(',') if product_id != '')
     except:
         logger.critical('Could not parse configuration file. Please make sure the appropriate structure is in place!')
         raise SystemExit(1)
@@ -1000,9 +1170,10 @@ if __name__ == "__main__":
         # which entries should be treated as movies (movies have been more or less
         # abandoned by GOG, so it's doubtful these ids will change going forward)
         with open(MOVIES_ID_CSV_PATH, 'r') as file:
-            MOVIES_ID_LIST = [int(movie_id) for movie_id in file.read().split()]
+            # membership is checked for every product query, so use a set
+            MOVIES_ID_LIST = frozenset(int(movie_id) for movie_id in file.read().split())
 
-        logger.debug(f'Read the following movie ids: {MOVIES_ID_LIST}')
+        logger.debug('Read the following movie ids: %s', sorted(MOVIES_ID_LIST))
     except:
         logger.critical('Could not parse movie ids csv file!')
         raise SystemExit(2)
@@ -1051,9 +1222,13 @@ if __name__ == "__main__":
             logger.critical('Could find specified DB file!')
             raise SystemExit(4)
 
+    # the scan queries will otherwise fail on every product, which ends up as a retry storm
+    if not gog_db_schema_check():
+        logger.critical('The DB schema is missing or outdated. Please run gog_db_schema.py -u before scanning!')
+        raise SystemExit(7)
+
     # inter-process resources locks
     db_lock = multiprocessing.Lock()
-    config_lock = multiprocessing.Lock()
     # shared process events
     terminate_event = multiprocessing.Event()
     terminate_event.clear()
@@ -1090,7 +1265,7 @@ if __name__ == "__main__":
                 process_tag_nice = ''.join(('P#', PROCESS_LOGGING_FILLER, str(process_no + 1), ' '))
 
                 process = multiprocessing.Process(target=worker_process,
-                                                  args=(process_tag_nice, scan_mode, id_queue, db_lock, config_lock,
+                                                  args=(process_tag_nice, scan_mode, id_queue, db_lock,
                                                         fail_event, terminate_event),
                                                   daemon=True)
                 process.start()
@@ -1101,6 +1276,17 @@ if __name__ == "__main__":
                 try:
                     # pass only the start product_id for the current batch
                     id_queue.put(product_id, True, QUEUE_WAIT_TIMEOUT)
+
+                    # the start id is saved once queued, since the scan restarts an ID_SAVE_INTERVAL
+                    # earlier anyway, which more than covers any batches still being processed
+                    if product_id % ID_SAVE_INTERVAL == 0:
+                        configParser['FULL_SCAN']['start_id'] = str(product_id)
+
+                        with open(CONF_FILE_PATH, 'w') as file:
+                            configParser.write(file)
+
+                        logger.info(f'Queued up to id: {product_id}...')
+
                     # skip an IDS_IN_BATCH interval
                     product_id += IDS_IN_BATCH
 
@@ -1126,6 +1312,10 @@ if __name__ == "__main__":
 
             logger.info('The worker processes have been stopped.')
 
+            # the worker processes can't fully checkpoint the WAL while any of the others are still writing
+            with gog_db_connect() as db_connection:
+                gog_db_checkpoint(db_connection, optimize=False)
+
     elif scan_mode == 'update':
         logger.info('--- Running in UPDATE scan mode ---')
 
@@ -1142,7 +1332,7 @@ if __name__ == "__main__":
             logger.info(f'Restarting update scan from id: {last_id}.')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT gp_id FROM gog_products WHERE gp_id > ? '
                                                   'AND gp_int_delisted IS NULL ORDER BY 1', (last_id,))
                 id_list = db_cursor.fetchall()
@@ -1154,42 +1344,15 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
-                        retries_complete = False
-                        retry_counter = 0
-    
-                        while not retries_complete and not terminate_event.is_set():
-                            if retry_counter > 0:
-                                logger.warning(f'Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                                sleep(RETRY_SLEEP_INTERVAL)
-                                logger.warning(f'Reprocessing id {current_product_id}...')
-    
-                            retries_complete, http_status = gog_product_extended_query('', current_product_id, scan_mode, db_lock,
-                                                                                       session, db_connection)
-    
-                            if retries_complete:
-                                if retry_counter > 0:
-                                    logger.info(f'Succesfully retried for {current_product_id}.')
-    
-                                last_id_counter += 1
-    
-                            else:
-                                retry_counter += 1
-                                # terminate the scan if the RETRY_COUNT limit is exceeded
-                                if retry_counter > RETRY_COUNT:
-                                    # skip the id if the server returns HTTP 500
-                                    if http_status == 500:
-                                        logger.warning(f'Skipping id {current_product_id} due to an HTTP 500 error code.')
-                                        retries_complete = True
-                                    else:
-                                        logger.critical('Retry count exceeded, terminating scan!')
-                                        fail_event.set()
-                                        terminate_event.set()
+                        logger.debug('Now processing id %s...', current_product_id)
+                        if gog_product_id_scan(current_product_id, scan_mode, db_lock, session, db_connection,
+                                               fail_event, terminate_event):
+                            last_id_counter += 1
                     else:
                         logger.warning(f'Skipping the following id: {current_product_id}.')
 
                     if last_id_counter % ID_SAVE_FREQUENCY == 0 and not terminate_event.is_set():
-                        configParser.read(CONF_FILE_PATH)
+                        # the config is only ever written by the scan itself, so there's no need to read it again
                         configParser['UPDATE_SCAN']['last_id'] = str(current_product_id)
 
                         with open(CONF_FILE_PATH, 'w') as file:
@@ -1197,8 +1360,7 @@ if __name__ == "__main__":
 
                         logger.info(f'Saved scan up to last_id of {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection, optimize=db_connection.total_changes > 0)
 
         except SystemExit:
             terminate_event.set()
@@ -1208,79 +1370,26 @@ if __name__ == "__main__":
         logger.info('--- Running in NEW scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
-                logger.info('Running scan for new arrival entries...')
-                page_no = 1
-                # start off with 1, then use whatever is returned by the API call
-                new_page_count = 1
-                # use default website pagination, which means the response can be split across 2+ pages in the API call
-                while page_no <= new_page_count and not terminate_event.is_set():
-                    retries_complete = False
-                    retry_counter = 0
-
-                    while not retries_complete and not terminate_event.is_set():
-                        if retry_counter > 0:
-                            logger.warning(f'Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                            sleep(RETRY_SLEEP_INTERVAL)
-                            logger.warning(f'Reprocessing new arrivals page {page_no}...')
-
-                        new_params = ''.join(('limit=48&releaseStatuses=in:new-arrival&order=desc:releaseDate&productType=in:game,pack,dlc,extras&page=',
-                                              # locales and currency don't matter here, but emulate default GOG website behavior
-                                              str(page_no), '&countryCode=BE&locale=en-US&currencyCode=EUR'))
-                        retries_complete, new_page_count = gog_product_games_catalog_query(new_params, scan_mode, db_lock,
-                                                                                           session, db_connection)
-
-                        if retries_complete:
-                            if retry_counter > 0:
-                                logger.info(f'Succesfully retried for page {page_no}.')
-
-                            page_no += 1
-
-                        else:
-                            retry_counter += 1
-                            # terminate the scan if the RETRY_COUNT limit is exceeded
-                            if retry_counter > RETRY_COUNT:
-                                logger.critical('Retry count exceeded, terminating scan!')
-                                fail_event.set()
-                                terminate_event.set()
-
-                logger.info('Running scan for upcoming entries...')
-                page_no = 1
-                # start off with 1, then use whatever is returned by the API call
-                upcoming_page_count = 1
-                # use default website pagination, which means the response can be split across 2+ pages in the API call
-                while page_no <= upcoming_page_count and not terminate_event.is_set():
-                    retries_complete = False
-                    retry_counter = 0
-
-                    while not retries_complete and not terminate_event.is_set():
-                        if retry_counter > 0:
-                            logger.warning(f'Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                            sleep(RETRY_SLEEP_INTERVAL)
-                            logger.warning(f'Reprocessing upcoming entries page {page_no}...')
-
-                        upcoming_params = ''.join(('limit=48&releaseStatuses=in:upcoming&order=desc:releaseDate&productType=in:game,pack,dlc,extras&page=',
-                                                   # locales and currency don't matter here, but emulate default GOG website behavior
-                                                   str(page_no), '&countryCode=BE&locale=en-US&currencyCode=EUR'))
-                        retries_complete, upcoming_page_count = gog_product_games_catalog_query(upcoming_params, scan_mode, db_lock,
-                                                                                                session, db_connection)
-
-                        if retries_complete:
-                            if retry_counter > 0:
-                                logger.info(f'Succesfully retried for page {page_no}.')
+            with gog_db_connect() as db_connection:
+                # the new arrival and upcoming catalog listings are independent, so fetch them concurrently
+                with ThreadPoolExecutor(max_workers=2) as catalog_executor:
+                    try:
+                        new_future = catalog_executor.submit(gog_product_games_catalog_scan, 'new arrival',
+                                                             NEW_ARRIVALS_CATALOG_PARAMETERS, fail_event, terminate_event)
+                        upcoming_future = catalog_executor.submit(gog_product_games_catalog_scan, 'upcoming',
+                                                                  UPCOMING_CATALOG_PARAMETERS, fail_event, terminate_event)
+                        # an id may be listed in both catalogs, but should only be processed once
+                        id_list = sorted(new_future.result() | upcoming_future.result())
+                    # let the catalog threads know they need to stop before waiting on them
+                    except SystemExit:
+                        terminate_event.set()
+                        raise
 
-                            page_no += 1
+                logger.debug('Retrieved all new arrival and upcoming product ids...')
 
-                        else:
-                            retry_counter += 1
-                            # terminate the scan if the RETRY_COUNT limit is exceeded
-                            if retry_counter > RETRY_COUNT:
-                                logger.critical('Retry count exceeded, terminating scan!')
-                                fail_event.set()
-                                terminate_event.set()
+                gog_product_ids_threaded_scan(id_list, scan_mode, db_lock, fail_event, terminate_event)
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -1290,49 +1399,17 @@ if __name__ == "__main__":
         logger.info('--- Running in BUILDS scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
-                db_cursor = db_connection.execute('SELECT gb_int_id FROM gog_builds WHERE gb_int_title IS NULL ORDER BY 1')
-                id_list = db_cursor.fetchall()
+            with gog_db_connect() as db_connection:
+                # ids which already have a product entry would only get skipped after the product query
+                db_cursor = db_connection.execute('SELECT gb_int_id FROM gog_builds WHERE gb_int_title IS NULL '
+                                                  'AND gb_int_id NOT IN (SELECT gp_id FROM gog_products) ORDER BY 1')
+                id_list = [id_entry[0] for id_entry in db_cursor.fetchall()]
 
                 logger.debug('Retrieved all unidentified build product ids from the DB...')
 
-                for id_entry in id_list:
-                    current_product_id = id_entry[0]
-                    
-                    if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
-                        retries_complete = False
-                        retry_counter = 0
-    
-                        while not retries_complete and not terminate_event.is_set():
-                            if retry_counter > 0:
-                                logger.warning(f'Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                                sleep(RETRY_SLEEP_INTERVAL)
-                                logger.warning(f'Reprocessing id {current_product_id}...')
-    
-                            retries_complete, http_status = gog_product_extended_query('', current_product_id, scan_mode, db_lock,
-                                                                                       session, db_connection)
-    
-                            if retries_complete:
-                                if retry_counter > 0:
-                                    logger.info(f'Succesfully retried for {current_product_id}.')
-                            else:
-                                retry_counter += 1
-                                # terminate the scan if the RETRY_COUNT limit is exceeded
-                                if retry_counter > RETRY_COUNT:
-                                    # skip the id if the server returns HTTP 500
-                                    if http_status == 500:
-                                        logger.warning(f'Skipping id {current_product_id} due to an HTTP 500 error code.')
-                                        retries_complete = True
-                                    else:
-                                        logger.critical('Retry count exceeded, terminating scan!')
-                                        fail_event.set()
-                                        terminate_event.set()
-                    else:
-                        logger.warning(f'Skipping the following id: {current_product_id}.')
+                gog_product_ids_threaded_scan(id_list, scan_mode, db_lock, fail_event, terminate_event)
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -1342,50 +1419,16 @@ if __name__ == "__main__":
         logger.info('--- Running in RELEASES scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT gr_external_id FROM gog_releases WHERE gr_external_id NOT IN '
                                                   '(SELECT gp_id FROM gog_products ORDER BY 1) ORDER BY 1')
-                id_list = db_cursor.fetchall()
+                id_list = [id_entry[0] for id_entry in db_cursor.fetchall()]
 
                 logger.debug('Retrieved all missing external releases ids from the DB...')
 
-                for id_entry in id_list:
-                    current_product_id = id_entry[0]
-                    
-                    if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
-                        retries_complete = False
-                        retry_counter = 0
-    
-                        while not retries_complete and not terminate_event.is_set():
-                            if retry_counter > 0:
-                                logger.warning(f'Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                                sleep(RETRY_SLEEP_INTERVAL)
-                                logger.warning(f'Reprocessing id {current_product_id}...')
-    
-                            retries_complete, http_status = gog_product_extended_query('', current_product_id, scan_mode, db_lock,
-                                                                                       session, db_connection)
-    
-                            if retries_complete:
-                                if retry_counter > 0:
-                                    logger.info(f'Succesfully retried for {current_product_id}.')
-                            else:
-                                retry_counter += 1
-                                # terminate the scan if the RETRY_COUNT limit is exceeded
-                                if retry_counter > RETRY_COUNT:
-                                    # skip the id if the server returns HTTP 500
-                                    if http_status == 500:
-                                        logger.warning(f'Skipping id {current_product_id} due to an HTTP 500 error code.')
-                                        retries_complete = True
-                                    else:
-                                        logger.critical('Retry count exceeded, terminating scan!')
-                                        fail_event.set()
-                                        terminate_event.set()
-                    else:
-                        logger.warning(f'Skipping the following id: {current_product_id}.')
+                gog_product_ids_threaded_scan(id_list, scan_mode, db_lock, fail_event, terminate_event)
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -1395,19 +1438,17 @@ if __name__ == "__main__":
         logger.info('--- Running in FILE EXTRACT scan mode ---')
 
         try:
-            with sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_db_connect() as db_connection:
+                # the extract parser only writes to gog_files, so the ids can be streamed straight from the cursor
                 db_cursor = db_connection.execute('SELECT gp_id FROM gog_products WHERE gp_int_delisted IS NULL ORDER BY 1')
-                id_list = db_cursor.fetchall()
-                logger.debug('Retrieved all existing product ids from the DB...')
 
-                for id_entry in id_list:
+                for id_entry in db_cursor:
                     current_product_id = id_entry[0]
-                    logger.debug(f'Now processing id {current_product_id}...')
+                    logger.debug('Now processing id %s...', current_product_id)
 
                     gog_files_extract_parser(db_connection, current_product_id)
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection, optimize=db_connection.total_changes > 0)
 
         except SystemExit:
             terminate_event.set()
@@ -1431,39 +1472,12 @@ if __name__ == "__main__":
             raise SystemExit(0)
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 for product_id in id_list:
                     logger.info(f'Running scan for id {product_id}...')
-                    retries_complete = False
-                    retry_counter = 0
-
-                    while not retries_complete and not terminate_event.is_set():
-                        if retry_counter > 0:
-                            logger.warning(f'Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                            sleep(RETRY_SLEEP_INTERVAL)
-                            logger.warning(f'Reprocessing id {product_id}...')
-
-                        retries_complete, http_status = gog_product_extended_query('', product_id, scan_mode, db_lock,
-                                                                                   session, db_connection)
+                    gog_product_id_scan(product_id, scan_mode, db_lock, session, db_connection, fail_event, terminate_event)
 
-                        if retries_complete:
-                            if retry_counter > 0:
-                                logger.info(f'Succesfully retried for {product_id}.')
-                        else:
-                            retry_counter += 1
-                            # terminate the scan if the RETRY_COUNT limit is exceeded
-                            if retry_counter > RETRY_COUNT:
-                                # skip the id if the server returns HTTP 500
-                                if http_status == 500:
-                                    logger.warning(f'Skipping id {product_id} due to an HTTP 500 error code.')
-                                    retries_complete = True
-                                else:
-                                    logger.critical('Retry count exceeded, terminating scan!')
-                                    fail_event.set()
-                                    terminate_event.set()
-
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection, optimize=db_connection.total_changes > 0)
 
         except SystemExit:
             terminate_event.set()
@@ -1473,7 +1487,7 @@ if __name__ == "__main__":
         logger.info('--- Running in DELISTED scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT gp_id FROM gog_products WHERE gp_int_delisted IS NOT NULL ORDER BY 1')
                 id_list = db_cursor.fetchall()
                 logger.debug('Retrieved all delisted product ids from the DB...')
@@ -1482,39 +1496,18 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
-                        retries_complete = False
-                        retry_counter = 0
-    
-                        while not retries_complete and not terminate_event.is_set():
-                            if retry_counter > 0:
-                                logger.warning(f'Retry number {retry_counter}. Sleeping for {RETRY_SLEEP_INTERVAL}s...')
-                                sleep(RETRY_SLEEP_INTERVAL)
-                                logger.warning(f'Reprocessing id {current_product_id}...')
-    
-                            retries_complete, http_status = gog_product_extended_query('', current_product_id, scan_mode, db_lock,
-                                                                                       session, db_connection)
-    
-                            if retries_complete:
-                                if retry_counter > 0:
-                                    logger.info(f'Succesfully retried for {current_product_id}.')
-                            else:
-                                retry_counter += 1
-                                # terminate the scan if the RETRY_COUNT limit is exceeded
-                                if retry_counter > RETRY_COUNT:
-                                    # skip the id if the server returns HTTP 500
-                                    if http_status == 500:
-                                        logger.warning(f'Skipping id {current_product_id} due to an HTTP 500 error code.')
-                                        retries_complete = True
-                                    else:
-                                        logger.critical('Retry count exceeded, terminating scan!')
-                                        fail_event.set()
-                                        terminate_event.set()
+                        logger.debug('Now processing id %s...', current_product_id)
+                        # most delisted ids will stay that way, so do a cheap HEAD request first and
+                        # only run the full product query (and retries) for ids which no longer return a 404
+                        if gog_product_listing_check(current_product_id, session) == 404:
+                            logger.debug('Product with id %s is still delisted. Skipping.', current_product_id)
+                            continue
+
+                        gog_product_id_scan(current_product_id, scan_mode, db_lock, session, db_connection, fail_event, terminate_event)
                     else:
                         logger.warning(f'Skipping the following id: {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection, optimize=db_connection.total_changes > 0)
 
         except SystemExit:
             terminate_event.set()
@@ -1522,7 +1515,6 @@ if __name__ == "__main__":
 
     if not terminate_event.is_set() and scan_mode == 'update':
         logger.info('Resetting last_id parameter...')
-        configParser.read(CONF_FILE_PATH)
         configParser['UPDATE_SCAN']['last_id'] = ''
 
         with open(CONF_FILE_PATH, 'w') as file:
@@ -19,9 +19,14 @@ from sys import argv
 from shutil import copy2
 from configparser import ConfigParser
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from time import sleep
-from collections import OrderedDict
 from logging.handlers import RotatingFileHandler
+try:
+    # optional, but a lot faster at parsing large API payloads
+    import orjson
+except ImportError:
+    orjson = None
 # uncomment for debugging purposes only
 #import traceback
 
@@ -57,8 +62,25 @@ UPDATE_RATING_QUERY = ('UPDATE gog_ratings SET grt_int_updated = ?, '
                        'grt_is_reviewable = ? WHERE grt_int_id = ?')
 
 OPTIMIZE_QUERY = 'PRAGMA optimize'
-
+# fully checkpoint and reset the WAL file once a scan is complete
+WAL_CHECKPOINT_QUERY = 'PRAGMA wal_checkpoint(TRUNCATE)'
+# WAL journaling lets the scan processes keep reading while another one is writing, and with
+# synchronous=NORMAL commits no longer wait on an fsync (the DB can't get corrupted, though
+# the last few commits may be lost on power failure, which a rescan will fix anyway)
+CONNECTION_PRAGMA_QUERIES = ('PRAGMA journal_mode=WAL',
+                             'PRAGMA synchronous=NORMAL',
+                             'PRAGMA temp_store=MEMORY',
+                             'PRAGMA cache_size=-20000',
+                             # memory map (up to) the first 256 MB of the DB file, to save on read syscalls
+                             'PRAGMA mmap_size=268435456')
+
+# number of seconds a connection will wait for the DB lock to be released by other processes
+DB_BUSY_TIMEOUT = 5 #seconds
 HTTP_OK = 200
+# number of hosts for which keep-alive connections are pooled by a session
+HTTP_POOL_CONNECTIONS = 4
+# number of keep-alive connections which are kept open for any given host
+HTTP_POOL_MAXSIZE = 10
 
 def sigterm_handler(signum, frame):
     logger.debug('Stopping scan due to SIGTERM...')
@@ -70,6 +92,42 @@ def sigint_handler(signum, frame):
 
     raise SystemExit(0)
 
+def gog_session():
+    session = requests.Session()
+    # retries are handled by the scan logic, so only tune connection pooling here
+    http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', http_adapter)
+
+    return session
+
+def gog_db_connect():
+    db_connection = sqlite3.connect(DB_FILE_PATH, timeout=DB_BUSY_TIMEOUT)
+
+    for pragma_query in CONNECTION_PRAGMA_QUERIES:
+        db_connection.execute(pragma_query)
+
+    return db_connection
+
+def gog_db_checkpoint(db_connection, optimize=True):
+    if optimize:
+        logger.debug('Running PRAGMA optimize...')
+        db_connection.execute(OPTIMIZE_QUERY)
+    # any pending changes need to be committed in order to be checkpointed
+    db_connection.commit()
+    logger.debug('Running WAL checkpoint...')
+    db_connection.execute(WAL_CHECKPOINT_QUERY)
+
+def json_loads(json_content):
+    if orjson is not None:
+        try:
+            return orjson.loads(json_content)
+        # orjson is stricter than the json module (e.g. when it comes to
+        # lone surrogates), so give any rejected payloads a second chance
+        except orjson.JSONDecodeError:
+            pass
+
+    return json.loads(json_content)
+
 def gog_ratings_query(product_id, is_verified, session):
 
     ratings_url = f'https://reviews.gog.com/v1/products/{product_id}/averageRating'
@@ -77,15 +135,15 @@ def gog_ratings_query(product_id, is_verified, session):
     if is_verified:
         ratings_url = ''.join((ratings_url, '?reviewer=verified_owner'))
 
-    logger.debug(f'RTQ >>> Querying url: {ratings_url}.')
+    logger.debug('RTQ >>> Querying url: %s.', ratings_url)
 
     try:
         response = session.get(ratings_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'RTQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('RTQ >>> HTTP response code: %s.', response.status_code)
 
         if response.status_code == HTTP_OK:
-            json_parsed = json.loads(response.text, object_pairs_hook=OrderedDict)
+            json_parsed = json_loads(response.content)
 
             value = json_parsed['value']
             count = json_parsed['count']
@@ -103,7 +161,7 @@ def gog_ratings_query(product_id, is_verified, session):
         return (None, None, False)
 
     except:
-        logger.debug(f'RTQ >>> Ratings query has failed for {product_id}.')
+        logger.debug('RTQ >>> Ratings query has failed for %s.', product_id)
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
 
@@ -117,19 +175,19 @@ def gog_reviews_query(product_id, session, db_connection):
     try:
         response = session.get(reviews_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'RVQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('RVQ >>> HTTP response code: %s.', response.status_code)
 
         if response.status_code == HTTP_OK:
-            json_parsed = json.loads(response.text, object_pairs_hook=OrderedDict)
+            json_parsed = json_loads(response.content)
 
             pages = json_parsed['pages']
-            logger.debug(f'RVQ >>> Pages: {pages}.')
+            logger.debug('RVQ >>> Pages: %s.', pages)
 
             db_cursor = db_connection.execute('SELECT COUNT(*) FROM gog_ratings WHERE grt_int_id = ?', (product_id,))
             entry_count = db_cursor.fetchone()[0]
 
             if pages > 0:
-                logger.debug(f'RVQ >>> Found something for id {product_id}...')
+                logger.debug('RVQ >>> Found something for id %s...', product_id)
 
                 json_formatted = json.dumps(json_parsed, sort_keys=True, indent=4, separators=(',', ': '), ensure_ascii=False)
 
@@ -183,7 +241,7 @@ def gog_reviews_query(product_id, session, db_connection):
 
                     # clear the removed status if an id is readded (should only happen rarely)
                     if existing_removed is not None:
-                        logger.debug(f'RVQ >>> Found a removed entry with id {product_id}. Clearing removed status...')
+                        logger.debug('RVQ >>> Found a removed entry with id %s. Clearing removed status...', product_id)
                         db_cursor.execute('UPDATE gog_ratings SET grt_int_removed = NULL WHERE grt_int_id = ?', (product_id,))
                         db_connection.commit()
                         logger.info(f'RVQ *** Cleared removed status for {product_id}: {product_title}.')
@@ -196,13 +254,13 @@ def gog_reviews_query(product_id, session, db_connection):
                         logger.info(f'RVQ ~~~ Successfully updated product title for DB entry with id {product_id}.')
 
                     if existing_json_formatted != json_formatted:
-                        logger.debug(f'RVQ >>> Existing entry for {product_id} is outdated. Updating...')
+                        logger.debug('RVQ >>> Existing entry for %s is outdated. Updating...', product_id)
 
                         # calculate the diff between the new json and the previous one
                         # (applying the diff on the new json will revert to the previous version)
                         if existing_json_formatted is not None:
-                            diff_formatted = ''.join([line for line in difflib.unified_diff(json_formatted.splitlines(1),
-                                                                                            existing_json_formatted.splitlines(1), n=0)])
+                            diff_formatted = ''.join(difflib.unified_diff(json_formatted.splitlines(keepends=True),
+                                                                          existing_json_formatted.splitlines(keepends=True), n=0))
                         else:
                             diff_formatted = None
 
@@ -224,16 +282,16 @@ def gog_reviews_query(product_id, session, db_connection):
 
                     # only alter the entry if not already marked as removed
                     if existing_removed is None:
-                        logger.debug(f'RVQ >>> Rating for {product_id} has been removed...')
+                        logger.debug('RVQ >>> Rating for %s has been removed...', product_id)
                         # also clear diff field when marking a rating as removed
                         db_cursor.execute('UPDATE gog_ratings SET grt_int_removed = ?, grt_int_json_diff = NULL '
                                           'WHERE grt_int_id = ?', (datetime.now().isoformat(' '), product_id))
                         db_connection.commit()
                         logger.info(f'RVQ --- Marked the DB entry for: {product_id}: {product_title} as removed.')
                     else:
-                        logger.debug(f'RVQ >>> Rating for {product_id} is already marked as removed.')
+                        logger.debug('RVQ >>> Rating for %s is already marked as removed.', product_id)
                 else:
-                    logger.debug(f'RVQ >>> {product_id} doesn\'t have any ratings.')
+                    logger.debug('RVQ >>> %s doesn\'t have any ratings.', product_id)
 
         # some ids will return a 504 error - skip them
         elif response.status_code == 504:
@@ -256,7 +314,7 @@ def gog_reviews_query(product_id, session, db_connection):
         return False
 
     except:
-        logger.debug(f'RVQ >>> Reviews query has failed for {product_id}.')
+        logger.debug('RVQ >>> Reviews query has failed for %s.', product_id)
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
 
@@ -301,8 +359,8 @@ if __name__ == "__main__":
 
         scan_mode = general_section.get('scan_mode')
         # ids that will be skipped, for one reason or another
-        SKIP_IDS = [int(product_id.strip()) for product_id in
-                    general_section.get('skip_ids').split(',') if product_id != '']
+        SKIP_IDS = frozenset(int(product_id.strip()) for product_id in
+                             general_section.get('skip_ids').split(',') if product_id != '')
         CONF_BACKUP = general_section.get('conf_backup')
         DB_BACKUP = general_section.get('db_backup')
         HTTP_TIMEOUT = general_section.getint('http_timeout')
@@ -364,7 +422,7 @@ if __name__ == "__main__":
             logger.info(f'Restarting update scan from id: {last_id}.')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT gp_id FROM gog_products WHERE gp_id > ? AND '
                                                   'gp_int_delisted IS NULL ORDER BY 1', (last_id,))
                 id_list = db_cursor.fetchall()
@@ -376,7 +434,7 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
+                        logger.debug('Now processing id %s...', current_product_id)
                         retries_complete = False
                         retry_counter = 0
     
@@ -414,8 +472,7 @@ if __name__ == "__main__":
 
                         logger.info(f'Saved scan up to last_id of {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_signal = True
@@ -425,7 +482,7 @@ if __name__ == "__main__":
         logger.info('--- Running in REMOVED scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 db_cursor = db_connection.execute('SELECT grt_int_id FROM gog_ratings WHERE grt_int_removed IS NOT NULL')
                 id_list = db_cursor.fetchall()
                 logger.debug('Retrieved all applicable product ids from the DB...')
@@ -434,7 +491,7 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
+                        logger.debug('Now processing id %s...', current_product_id)
                         retries_complete = False
                         retry_counter = 0
     
@@ -461,8 +518,7 @@ if __name__ == "__main__":
                     else:
                         logger.warning(f'Skipping the following id: {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_signal = True
@@ -21,9 +21,14 @@ from sys import argv
 from shutil import copy2
 from configparser import ConfigParser
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from time import sleep
-from collections import OrderedDict
 from logging.handlers import RotatingFileHandler
+try:
+    # optional, but a lot faster at parsing large API payloads
+    import orjson
+except ImportError:
+    orjson = None
 # uncomment for debugging purposes only
 #import traceback
 
@@ -60,6 +65,17 @@ UPDATE_ID_QUERY = ('UPDATE gog_releases SET gr_int_updated = ?, '
                    'gr_aggregated_rating = ? WHERE gr_external_id = ?')
 
 OPTIMIZE_QUERY = 'PRAGMA optimize'
+# fully checkpoint and reset the WAL file once a scan is complete
+WAL_CHECKPOINT_QUERY = 'PRAGMA wal_checkpoint(TRUNCATE)'
+# WAL journaling lets the scan processes keep reading while another one is writing, and with
+# synchronous=NORMAL commits no longer wait on an fsync (the DB can't get corrupted, though
+# the last few commits may be lost on power failure, which a rescan will fix anyway)
+CONNECTION_PRAGMA_QUERIES = ('PRAGMA journal_mode=WAL',
+                             'PRAGMA synchronous=NORMAL',
+                             'PRAGMA temp_store=MEMORY',
+                             'PRAGMA cache_size=-20000',
+                             # memory map (up to) the first 256 MB of the DB file, to save on read syscalls
+                             'PRAGMA mmap_size=268435456')
 
 # value separator for multi-valued fields
 MVF_VALUE_SEPARATOR = '; '
@@ -68,7 +84,13 @@ QUEUE_WAIT_TIMEOUT = 10 #seconds
 # allow a process to fully load before starting the next process
 # (helps preserve process start order for logging purposes)
 PROCESS_START_WAIT_INTERVAL = 0.05 #seconds
+# number of seconds a connection will wait for the DB lock to be released by other processes
+DB_BUSY_TIMEOUT = 5 #seconds
 HTTP_OK = 200
+# number of hosts for which keep-alive connections are pooled by a session
+HTTP_POOL_CONNECTIONS = 4
+# number of keep-alive connections which are kept open for any given host
+HTTP_POOL_MAXSIZE = 10
 
 def sigterm_handler(signum, frame):
     # exceptions may happen here as well due to logger syncronization mayhem on shutdown
@@ -88,6 +110,42 @@ def sigint_handler(signum, frame):
 
     raise SystemExit(0)
 
+def gog_session():
+    session = requests.Session()
+    # retries are handled by the scan logic, so only tune connection pooling here
+    http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', http_adapter)
+
+    return session
+
+def gog_db_connect():
+    db_connection = sqlite3.connect(DB_FILE_PATH, timeout=DB_BUSY_TIMEOUT)
+
+    for pragma_query in CONNECTION_PRAGMA_QUERIES:
+        db_connection.execute(pragma_query)
+
+    return db_connection
+
+def gog_db_checkpoint(db_connection, optimize=True):
+    if optimize:
+        logger.debug('Running PRAGMA optimize...')
+        db_connection.execute(OPTIMIZE_QUERY)
+    # any pending changes need to be committed in order to be checkpointed
+    db_connection.commit()
+    logger.debug('Running WAL checkpoint...')
+    db_connection.execute(WAL_CHECKPOINT_QUERY)
+
+def json_loads(json_content):
+    if orjson is not None:
+        try:
+            return orjson.loads(json_content)
+        # orjson is stricter than the json module (e.g. when it comes to
+        # lone surrogates), so give any rejected payloads a second chance
+        except orjson.JSONDecodeError:
+            pass
+
+    return json.loads(json_content)
+
 def gog_releases_query(process_tag, release_id, scan_mode, db_lock, session, db_connection):
 
     releases_url = f'https://gamesdb.gog.com/platforms/gog/external_releases/{release_id}'
@@ -95,7 +153,7 @@ def gog_releases_query(process_tag, release_id, scan_mode, db_lock, session, db_
     try:
         response = session.get(releases_url, timeout=HTTP_TIMEOUT)
 
-        logger.debug(f'{process_tag}RQ >>> HTTP response code: {response.status_code}.')
+        logger.debug('%sRQ >>> HTTP response code: %s.', process_tag, response.status_code)
 
         if response.status_code == HTTP_OK:
             if scan_mode == 'full':
@@ -105,7 +163,7 @@ def gog_releases_query(process_tag, release_id, scan_mode, db_lock, session, db_
             entry_count = db_cursor.fetchone()[0]
 
             if not (entry_count == 1 and scan_mode == 'full'):
-                json_parsed = json.loads(response.text, object_pairs_hook=OrderedDict)
+                json_parsed = json_loads(response.content)
                 json_formatted = json.dumps(json_parsed, sort_keys=True, indent=4, separators=(',', ': '), ensure_ascii=False)
 
                 # process unmodified fields
@@ -113,11 +171,9 @@ def gog_releases_query(process_tag, release_id, scan_mode, db_lock, session, db_
                 release_title = json_parsed['title']['*'].strip()
                 release_type = json_parsed['type']
                 # process supported oses
-                supported_oses = MVF_VALUE_SEPARATOR.join(sorted([os['slug'] for os in json_parsed['supported_operating_systems']]))
-                if supported_oses == '': supported_oses = None
+                supported_oses = MVF_VALUE_SEPARATOR.join(sorted(os['slug'] for os in json_parsed['supported_operating_systems'])) or None
                 # process genres
-                genres = MVF_VALUE_SEPARATOR.join(sorted([genre['name']['*'] for genre in json_parsed['game']['genres']]))
-                if genres == '': genres = None
+                genres = MVF_VALUE_SEPARATOR.join(sorted(genre['name']['*'] for genre in json_parsed['game']['genres'])) or None
                 # process unmodified fields
                 try:
                     series = json_parsed['game']['series']['name']
@@ -155,20 +211,20 @@ def gog_releases_query(process_tag, release_id, scan_mode, db_lock, session, db_
 
                     # clear the delisted status if an id is relisted (should only happen rarely)
                     if existing_delisted is not None:
-                        logger.debug(f'{process_tag}RQ >>> Found a previously delisted entry with id {release_id}. Removing delisted status...')
+                        logger.debug('%sRQ >>> Found a previously delisted entry with id %s. Removing delisted status...', process_tag, release_id)
                         with db_lock:
                             db_cursor.execute('UPDATE gog_releases SET gr_int_delisted = NULL WHERE gr_external_id = ?', (release_id,))
                             db_connection.commit()
                         logger.info(f'{process_tag}RQ *** Removed delisted status for {release_id}: {release_title}.')
 
                     if existing_json_formatted != json_formatted:
-                        logger.debug(f'{process_tag}RQ >>> Existing entry for {release_id} is outdated. Updating...')
+                        logger.debug('%sRQ >>> Existing entry for %s is outdated. Updating...', process_tag, release_id)
 
                         # calculate the diff between the new json and the previous one
                         # (applying the diff on the new json will revert to the previous version)
                         if existing_json_formatted is not None:
-                            diff_formatted = ''.join([line for line in difflib.unified_diff(json_formatted.splitlines(1),
-                                                                                            existing_json_formatted.splitlines(1), n=0)])
+                            diff_formatted = ''.join(difflib.unified_diff(json_formatted.splitlines(keepends=True),
+                                                                          existing_json_formatted.splitlines(keepends=True), n=0))
                         else:
                             diff_formatted = None
 
@@ -190,7 +246,7 @@ def gog_releases_query(process_tag, release_id, scan_mode, db_lock, session, db_
 
             # only alter the entry if not already marked as no longer listed
             if existing_delisted is None:
-                logger.debug(f'{process_tag}RQ >>> Release with id {release_id} has been delisted...')
+                logger.debug('%sRQ >>> Release with id %s has been delisted...', process_tag, release_id)
                 with db_lock:
                     # also clear diff field when marking a release as delisted
                     db_cursor.execute('UPDATE gog_releases SET gr_int_delisted = ?, gr_int_json_diff = NULL '
@@ -198,11 +254,11 @@ def gog_releases_query(process_tag, release_id, scan_mode, db_lock, session, db_
                     db_connection.commit()
                 logger.info(f'{process_tag}RQ --- Delisted the DB entry for: {release_id}: {release_title}.')
             else:
-                logger.debug(f'{process_tag}RQ >>> Release with id {release_id} is already marked as delisted.')
+                logger.debug('%sRQ >>> Release with id %s is already marked as delisted.', process_tag, release_id)
 
         # unmapped ids will also return a 404 HTTP error code
         elif response.status_code == 404:
-            logger.debug(f'{process_tag}RQ >>> Release with id {release_id} returned an HTTP 404 error code. Skipping.')
+            logger.debug('%sRQ >>> Release with id %s returned an HTTP 404 error code. Skipping.', process_tag, release_id)
 
         else:
             logger.warning(f'{process_tag}RQ >>> HTTP error code {response.status_code} received for {release_id}.')
@@ -221,7 +277,7 @@ def gog_releases_query(process_tag, release_id, scan_mode, db_lock, session, db_
         return False
 
     except:
-        logger.debug(f'{process_tag}RQ >>> External releases query has failed for {release_id}.')
+        logger.debug('%sRQ >>> External releases query has failed for %s.', process_tag, release_id)
         # uncomment for debugging purposes only
         #logger.error(traceback.format_exc())
 
@@ -236,7 +292,7 @@ def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
 
     processConfigParser = ConfigParser()
 
-    with requests.Session() as processSession, sqlite3.connect(DB_FILE_PATH) as process_db_connection:
+    with gog_session() as processSession, gog_db_connect() as process_db_connection:
         logger.info(f'{process_tag}>>> Starting worker process...')
 
         try:
@@ -248,7 +304,7 @@ def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
 
                 while not retries_complete and not terminate_event.is_set():
                     if retry_counter > 0:
-                        logger.debug(f'{process_tag}>>> Retry count: {retry_counter}.')
+                        logger.debug('%s>>> Retry count: %s.', process_tag, retry_counter)
                         # main iteration incremental sleep
                         sleep((INCREMENTAL_RETRY_BASE ** (retry_counter - 1)) * RETRY_SLEEP_INTERVAL)
 
@@ -278,14 +334,14 @@ def worker_process(process_tag, scan_mode, id_queue, db_lock, config_lock,
 
         # the main process has stopped populating the queue if this exception is raised
         except queue.Empty:
-            logger.debug(f'{process_tag}>>> Timed out while waiting for queue.')
+            logger.debug('%s>>> Timed out while waiting for queue.', process_tag)
 
         except SystemExit:
             pass
 
         logger.info(f'{process_tag}>>> Stopping worker process...')
 
-        logger.debug(f'{process_tag}>>> Running PRAGMA optimize...')
+        logger.debug('%s>>> Running PRAGMA optimize...', process_tag)
         with db_lock:
             process_db_connection.execute(OPTIMIZE_QUERY)
 
@@ -331,8 +387,8 @@ if __name__ == "__main__":
 
         scan_mode = general_section.get('scan_mode')
         # ids that will be skipped, for one reason or another
-        SKIP_IDS = [int(product_id.strip()) for product_id in
-                    general_section.get('skip_ids').split(',') if product_id != '']
+        SKIP_IDS = frozenset(int(product_id.strip()) for product_id in
+                             general_section.get('skip_ids').split(',') if product_id != '')
         CONF_BACKUP = general_section.get('conf_backup')
         DB_BACKUP = general_section.get('db_backup')
         HTTP_TIMEOUT = general_section.getint('http_timeout')
@@ -429,7 +485,7 @@ if __name__ == "__main__":
                 try:
                     if product_id not in SKIP_IDS:
                         id_queue.put(product_id, True, QUEUE_WAIT_TIMEOUT)
-                        logger.debug(f'Processing the following id: {product_id}.')
+                        logger.debug('Processing the following id: %s.', product_id)
                     else:
                         logger.warning(f'Skipping the following id: {product_id}.')
                         
@@ -457,6 +513,10 @@ if __name__ == "__main__":
 
             logger.info('The worker processes have been stopped.')
 
+            # the worker processes can't fully checkpoint the WAL while any of the others are still writing
+            with gog_db_connect() as db_connection:
+                gog_db_checkpoint(db_connection, optimize=False)
+
     elif scan_mode == 'update':
         logger.info('--- Running in UPDATE scan mode ---')
 
@@ -473,7 +533,7 @@ if __name__ == "__main__":
             logger.info(f'Restarting update scan from id: {last_id}.')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 # skip releases which are no longer listed
                 db_cursor = db_connection.execute('SELECT gr_external_id FROM gog_releases WHERE gr_external_id > ? '
                                                   'AND gr_int_delisted IS NULL ORDER BY 1', (last_id,))
@@ -486,7 +546,7 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
+                        logger.debug('Now processing id %s...', current_product_id)
                         retries_complete = False
                         retry_counter = 0
     
@@ -524,8 +584,7 @@ if __name__ == "__main__":
 
                         logger.info(f'Saved scan up to last_id of {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -535,7 +594,7 @@ if __name__ == "__main__":
         logger.info('--- Running in PRODUCTS scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 # select all existing ids from the gog_products table which are not already present in the
                 # gog_releases table and atempt to scan them from matching releases API entries
                 db_cursor = db_connection.execute('SELECT gp_id FROM gog_products WHERE gp_id NOT IN '
@@ -548,7 +607,7 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
+                        logger.debug('Now processing id %s...', current_product_id)
                         retries_complete = False
                         retry_counter = 0
     
@@ -574,8 +633,7 @@ if __name__ == "__main__":
                     else:
                         logger.warning(f'Skipping the following id: {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -599,7 +657,7 @@ if __name__ == "__main__":
             raise SystemExit(0)
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 for product_id in id_list:
                     logger.info(f'Running scan for id {product_id}...')
                     retries_complete = False
@@ -625,8 +683,7 @@ if __name__ == "__main__":
                                 fail_event.set()
                                 terminate_event.set()
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()
@@ -636,7 +693,7 @@ if __name__ == "__main__":
         logger.info('--- Running in REMOVED scan mode ---')
 
         try:
-            with requests.Session() as session, sqlite3.connect(DB_FILE_PATH) as db_connection:
+            with gog_session() as session, gog_db_connect() as db_connection:
                 # select all existing ids from the gog_products table which are not already present in the
                 # gog_releases table and atempt to scan them from matching releases API entries
                 db_cursor = db_connection.execute('SELECT gr_external_id FROM gog_releases WHERE gr_int_delisted IS NOT NULL ORDER BY 1')
@@ -647,7 +704,7 @@ if __name__ == "__main__":
                     current_product_id = id_entry[0]
                     
                     if current_product_id not in SKIP_IDS:
-                        logger.debug(f'Now processing id {current_product_id}...')
+                        logger.debug('Now processing id %s...', current_product_id)
                         retries_complete = False
                         retry_counter = 0
     
@@ -673,8 +730,7 @@ if __name__ == "__main__":
                     else:
                         logger.warning(f'Skipping the following id: {current_product_id}.')
 
-                logger.debug('Running PRAGMA optimize...')
-                db_connection.execute(OPTIMIZE_QUERY)
+                gog_db_checkpoint(db_connection)
 
         except SystemExit:
             terminate_event.set()